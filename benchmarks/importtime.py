@@ -0,0 +1,123 @@
+"""Time the imports each page pays for on a cold worker, from `python -X importtime`.
+
+    python benchmarks/importtime.py                        # report to benchmarks/results/
+    python benchmarks/importtime.py --repeat 10 --top 15
+    python benchmarks/importtime.py --baseline benchmarks/results/importtime-main.json --threshold 1.25
+
+Every target is imported `--repeat` times, each in a fresh interpreter, after its prelude: the
+pages after streamlit, which the server has loaded before any page runs, and the headless metrics
+module on its own. A target's time is the cumulative import time of what it loads beyond the
+prelude, reported by its best and median; the slowest packages of the median run show where that
+time goes. With --baseline the exit status is 1 when a median grew by more than --threshold times
+the baseline's, as in run.py.
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PAGES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pages')
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_THRESHOLD = 1.25
+# (name, modules imported first, module timed)
+TARGETS = [
+    ('streamlit', (), 'streamlit'),
+    ('EDA', ('streamlit',), 'eda'),
+    ('Outbound Sizing', ('streamlit',), 'outbound_sizing'),
+    ('Attribution Model', ('streamlit',), 'attribution'),
+    ('metrics (headless)', (), 'core.metrics'),
+]
+# Packages only some code paths need, which should not load with a page
+LAZY_MODULES = ('duckdb', 'requests')
+
+
+def import_times(prelude, module, pages_folder):
+    """Per-module (self, cumulative) microseconds of importing `module` after `prelude`, in import order."""
+    code = "".join(f"import {name}\n" for name in prelude) + "import sys\nsys.stderr.write('-- timed --\\n')\n" \
+        + f"import {module}\n"
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [pages_folder, os.environ.get('PYTHONPATH')]))}
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=pages_folder, env=env,
+                               capture_output=True, text=True, check=True)
+    times = []
+    timed = False
+    for line in completed.stderr.splitlines():
+        if line == '-- timed --':
+            timed = True
+        elif timed and line.startswith('import time:') and not line.endswith('| imported package'):
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            times.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def summarize(times, top):
+    """Total of a run, its slowest packages by self time, and which LAZY_MODULES it loaded."""
+    # Top-level imports are the ones with the least indentation; their cumulative times add up to the run
+    indent = min(len(name) - len(name.lstrip()) for name, _, _ in times)
+    total = sum(cumulative for name, _, cumulative in times if len(name) - len(name.lstrip()) == indent)
+    by_package = collections.Counter()
+    for name, self_us, _ in times:
+        by_package[name.strip().split('.')[0]] += self_us
+    loaded = {name.strip() for name, _, _ in times}
+    return {'seconds': total / 1e6,
+            'slowest': [(package, us / 1e6) for package, us in by_package.most_common(top)],
+            'lazy_modules_loaded': [name for name in LAZY_MODULES if name in loaded]}
+
+
+def run(repeat, top, pages_folder):
+    results = []
+    for name, prelude, module in TARGETS:
+        runs = [summarize(import_times(prelude, module, pages_folder), top) for _ in range(repeat)]
+        seconds = [r['seconds'] for r in runs]
+        median_run = sorted(runs, key=lambda r: r['seconds'])[len(runs) // 2]
+        results.append({'case': name, 'module': module, 'prelude': list(prelude), 'best': min(seconds),
+                        'median': statistics.median(seconds), 'runs': seconds, **median_run})
+        slowest = ", ".join(f"{package} {s * 1000:.0f}ms" for package, s in median_run['slowest'][:5])
+        print(f"  {name:<20} best {min(seconds):7.3f}s  median {statistics.median(seconds):7.3f}s  ({slowest})")
+        if median_run['lazy_modules_loaded']:
+            print(f"  {'':<20} loads {', '.join(median_run['lazy_modules_loaded'])}")
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """Targets whose median is more than `threshold` times the baseline's, as (case, ratio)."""
+    previous = {row['case']: row['median'] for row in baseline['results']}
+    return [(row['case'], row['median'] / previous[row['case']]) for row in results
+            if previous.get(row['case']) and row['median'] > threshold * previous[row['case']]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="slowest packages to keep per target")
+    parser.add_argument('--pages', default=PAGES_FOLDER, help="pages folder to import from (default: this tree's)")
+    parser.add_argument('--out', help="JSON report path (default: benchmarks/results/importtime-<timestamp>.json)")
+    parser.add_argument('--baseline', help="earlier JSON report to check for regressions against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="a target regresses when its median exceeds this many times the baseline median")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.top, os.path.abspath(args.pages))
+    started_at = datetime.datetime.now().isoformat(timespec='seconds')
+    report = {'started_at': started_at, 'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}
+    out = args.out or os.path.join(RESULTS_FOLDER, f"importtime-{started_at.replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.threshold)
+        for case, ratio in slower:
+            print(f"REGRESSION {case}: {ratio:.2f}x the baseline median import time")
+        if slower:
+            sys.exit(1)
+        print(f"No target slower than {args.threshold}x the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Time the hot path of every page on synthetic data, outside Streamlit.
+
+    python benchmarks/run.py                              # 1x and 10x, report to benchmarks/results/
+    python benchmarks/run.py --scales 1 10 100 --repeat 5
+    python benchmarks/run.py --baseline benchmarks/results/main.json --threshold 1.25
+
+Each case is run `--repeat` times after its setup and reported by its best and median wall time.
+With --baseline, cases whose median grew by more than --threshold times the baseline median are
+listed and the exit status is 1, so the check can gate a CI job.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from pages.core.attribution_engine import customer_journeys, last_touch_attribution, orders_per_month  # noqa: E402
+from pages.core.charts import campaign_timeline_figure  # noqa: E402
+from pages.core.filters import FilterIndex  # noqa: E402
+from pages.core.journeys import Journeys, PathIndex  # noqa: E402
+from pages.core.multitouch import compare_models, markov_removal_effects  # noqa: E402
+from pages.core.query import QueryEngine  # noqa: E402
+from pages.core.rollups import CUBE_KEYS, aggregate_market, gmv_by_category, shopify_tam, top_by_total_gmv  # noqa: E402
+from pages.core.schema import prepare_table  # noqa: E402
+from pages.core.snapshot import SNAPSHOT_FOLDER, read_snapshot  # noqa: E402
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SCALES = (1, 10)
+DEFAULT_THRESHOLD = 1.25
+PAGE_TABLES = ('outbound', 'market', 'tenants')
+
+
+def cases(db_path, tables):
+    """(name, rows in, setup, run) per benchmark; setup returns what run takes."""
+    snapshots = os.path.join(os.path.dirname(db_path), SNAPSHOT_FOLDER)
+    prepared = {name: prepare_table(tables[name], name) for name in PAGE_TABLES}
+    market = prepared['market']
+
+    def load_data():
+        return {name: read_snapshot(db_path, name) for name in tables}
+
+    def market_rollups():
+        cube = aggregate_market(market)
+        filters = dict(platform='Shopify', gmv_categories=synthetic.GMV_CATEGORIES[1:], country=None)
+        return (gmv_by_category(cube, **filters), top_by_total_gmv(cube, 'PLATFORM', **filters),
+                top_by_total_gmv(cube, 'COUNTRY', **filters), shopify_tam(cube))
+
+    def attribution_groupbys(journeys):
+        path_index = PathIndex(journeys)
+        return (journeys.step_source_counts(), journeys.source_funnel('google', max_step=9),
+                journeys.path_lengths(), path_index.transitions(10, journeys.select('a.myshopify.com')),
+                compare_models(journeys), markov_removal_effects(journeys))
+
+    cjm = tables['attribution_cjm']
+    yield 'load_data (cold snapshots)', sum(map(len, tables.values())), \
+        lambda: shutil.rmtree(snapshots, ignore_errors=True), lambda _: load_data()
+    yield 'load_data (warm snapshots)', sum(map(len, tables.values())), load_data, lambda _: load_data()
+    for name in PAGE_TABLES:
+        yield f"prepare_table ({name})", len(tables[name]), lambda name=name: tables[name], \
+            lambda df, name=name: prepare_table(df, name)
+    yield 'market filter (index build + select)', len(market), lambda: None, lambda _: market.iloc[
+        FilterIndex(market, CUBE_KEYS).select(PLATFORM='Shopify', GMV_CATEGORY=synthetic.GMV_CATEGORIES[1:],
+                                              COUNTRY='United States')]
+    yield 'market rollups', len(market), lambda: None, lambda _: market_rollups()
+    yield 'outbound timeline figure', len(prepared['outbound']), lambda: None, \
+        lambda _: campaign_timeline_figure(prepared['outbound'], 'NEW_ARR_FROM_OB_ALL_TIME')
+    yield 'attribution_cjm journeys build', len(cjm), lambda: None, lambda _: Journeys(cjm)
+    yield 'attribution groupbys', len(cjm), lambda: Journeys(cjm), attribution_groupbys
+    yield 'attribution_cjm pandas groupby (reference)', len(cjm), lambda: None, lambda _: cjm.groupby(
+        ['TOUCHPOINT_STEP', 'ATTRIBUTION_SOURCE'])['SHOPIFYORDERID'].nunique()
+
+    def engine():
+        query_engine = QueryEngine(db_path)
+        query_engine.use_table('pixel')
+        return query_engine
+    n_events = len(tables['pixel'])
+    yield 'SQL last touch', n_events, engine, lambda query_engine: last_touch_attribution(query_engine, 'pixel')
+    yield 'SQL customer journeys', n_events, engine, lambda query_engine: customer_journeys(query_engine, 'pixel')
+    yield 'SQL orders per month', n_events, engine, lambda query_engine: orders_per_month(query_engine, 'pixel')
+
+
+def run(scales, repeat, workdir):
+    results = []
+    for scale in scales:
+        db_path = os.path.join(workdir, f"scale{scale}", 'database.db')
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        started = time.perf_counter()
+        tables = synthetic.write_database(db_path, scale)
+        print(f"{scale}x: generated {sum(map(len, tables.values())):,} rows in {time.perf_counter() - started:.1f}s")
+        for name, rows, setup, func in cases(db_path, tables):
+            seconds = []
+            for _ in range(repeat):
+                argument = setup()
+                started = time.perf_counter()
+                func(argument)
+                seconds.append(time.perf_counter() - started)
+            results.append({'case': name, 'scale': scale, 'rows': rows, 'best': min(seconds),
+                            'median': statistics.median(seconds), 'runs': seconds})
+            print(f"  {name:<45} {rows:>10,} rows  best {min(seconds):8.4f}s  median {statistics.median(seconds):8.4f}s")
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'duckdb': duckdb.__version__,
+    }
+
+
+def regressions(results, baseline, threshold):
+    """Cases whose median is more than `threshold` times the baseline's, as (case, scale, ratio)."""
+    previous = {(row['case'], row['scale']): row['median'] for row in baseline['results']}
+    slower = []
+    for row in results:
+        before = previous.get((row['case'], row['scale']))
+        if before and row['median'] > threshold * before:
+            slower.append((row['case'], row['scale'], row['median'] / before))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help="JSON report path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', help="earlier JSON report to check for regressions against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="a case regresses when its median exceeds this many times the baseline median")
+    parser.add_argument('--workdir', help="where the synthetic databases are written (default: a temp folder)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='growth-bench-')
+    try:
+        results = run(args.scales, args.repeat, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    started_at = datetime.datetime.now().isoformat(timespec='seconds')
+    report = {'started_at': started_at, 'environment': environment(), 'repeat': args.repeat, 'results': results}
+    out = args.out or os.path.join(RESULTS_FOLDER, f"{started_at.replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.threshold)
+        for case, scale, ratio in slower:
+            print(f"REGRESSION {case} at {scale}x: {ratio:.2f}x the baseline median")
+        if slower:
+            sys.exit(1)
+        print(f"No case slower than {args.threshold}x the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Synthetic versions of the tables in db/database.db, with their real column names and the same
+# text encodings (dollar-formatted currency, ISO dates, Shopify order timestamps with offsets).
+# Sizes are BASE_ROWS times the scale; values are random but seeded, so a given scale always
+# produces the same database.
+
+BASE_ROWS = {
+    'outbound': 50,
+    'market': 20_000,
+    'tenants': 2_000,
+    'pixel': 20_000,
+    'attribution_cjm': 5_000,  # orders; each has one to a dozen touchpoints
+}
+
+CAMPAIGN_GROUPS = ['GA4', 'GPT V3-CAPI', 'Loom', 'Klaviyo flows enrich', 'Ask Polar Lite', 'GPT V4 (GPT-4o)',
+                   'Black Friday', 'Reactivation']
+OUTBOUND_COUNTS = [
+    'NB_EMAILS', 'NB_CONTACTS_TOUCHED', 'NB_COMPANIES_TOUCHED', 'TOTAL_NB_CLICKS',
+    'TOTAL_NB_POSITIVE_REPLIES_PER_CAMPAIGN', 'TOTAL_NB_NEGATIVE_REPLIES_PER_CAMPAIGN',
+    'NB_COMPANIES_CLICKED', 'NB_CUSTOMERS_FROM_OB_ALL_TIME',
+]
+OUTBOUND_ICP_COUNTS = [
+    'NB_COMPANIES_TOUCHED_ICP', 'NB_COMPANIES_CLICKED_ICP', 'NB_COMPANIES_REPLIED_ICP',
+    'NB_COMPANIES_REPLIED_POSITIVE_ICP', 'NB_COMPANIES_CLICKED_ICP.1', 'NB_COMPANIES_REPLIED_ICP.1',
+    'NB_COMPANIES_REPLIED_POSITIVE_ICP.1',
+]
+PLATFORMS = ['Shopify', 'Shopify Plus', 'Magento', 'WooCommerce', 'BigCommerce', 'Salesforce Commerce Cloud']
+GMV_CATEGORIES = ['a) < $1M', 'b) $1M - $5M', 'c) $5M - $10M', 'd) $10M - $50M', 'e) > $50M']
+COUNTRIES = ['United States', 'Canada', 'United Kingdom', 'France', 'Germany', 'Australia', 'Netherlands',
+             'Spain', 'Italy', 'Japan', 'Brazil', 'Mexico']
+SOURCES = ['direct', 'referral', 'google', 'facebook', 'instagram', 'attentive', 'klaviyo']
+REFERRERS = ['', 'https://www.google.com/', 'https://l.facebook.com/', 'https://www.instagram.com/',
+             'https://blog.example.com/post', None]
+
+
+def _dollars(values):
+    return pd.Series(values).map('${:,.0f}'.format)
+
+
+def outbound(rows, rng):
+    start = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    df = pd.DataFrame({
+        'CAMPAIGN_GROUP': rng.choice(CAMPAIGN_GROUPS, rows),
+        'CAMPAIGN_START_DATE': start.strftime('%Y-%m-%d'),
+        'CAMPAIGN_LAST_DATE': (start + pd.to_timedelta(rng.integers(1, 120, rows), unit='D')).strftime('%Y-%m-%d'),
+    })
+    for col in OUTBOUND_COUNTS:
+        df[col] = rng.integers(0, 5_000, rows)
+    df['PIPELINE_OPP_AMOUNT_FROM_OB_ALL_TIME'] = _dollars(rng.pareto(1.2, rows) * 2_000)
+    df['NEW_ARR_FROM_OB_ALL_TIME'] = _dollars(rng.pareto(1.2, rows) * 1_000)
+    for col in OUTBOUND_ICP_COUNTS:
+        df[col] = rng.integers(0, 5_000, rows)
+    return df
+
+
+def market(rows, rng):
+    domains = rng.integers(1, 2_000, rows)
+    avg_gmv = rng.lognormal(11, 1.5, rows)
+    return pd.DataFrame({
+        'PLATFORM': rng.choice(PLATFORMS, rows, p=[.4, .15, .15, .15, .1, .05]),
+        'GMV_CATEGORY': rng.choice(GMV_CATEGORIES, rows),
+        'COUNTRY': rng.choice(COUNTRIES, rows),
+        'NB_DOMAINS': domains,
+        'TOTAL_GMV': _dollars(avg_gmv * domains),
+        'AVG_GMV': _dollars(avg_gmv),
+        'POLAR ARR ($)': _dollars(np.where(rng.random(rows) < .2, 0, avg_gmv * 0.01)),
+    })
+
+
+def tenants(rows, rng):
+    datasource_ids = rng.integers(1, rows * 3, rows)
+    return pd.DataFrame({
+        'TENANT_ID': [f"tenant_{i}" for i in rng.integers(0, max(rows // 10, 1), rows)],
+        'DATASOURCE_ID': datasource_ids,
+        'SHOPIFY_URL': [f"store{i}.myshopify.com" for i in datasource_ids],
+    })
+
+
+def pixel(rows, rng):
+    """Flattened pixel events (the DATA:<field> columns of attribution_engine.PIXEL_COLUMNS).
+
+    About one event in seven is a thank-you page; each order also gets a touchpoint at its own
+    timestamp and ip, which is how queries.sql matches touchpoints to orders.
+    """
+    n_visitors = max(rows // 8, 5)
+    timestamps = 1_664_582_400 + rng.integers(0, 300 * 86_400, rows)
+    events = pd.DataFrame({
+        'timestamp': timestamps,
+        'userId': rng.choice(np.array([f"u{i}" for i in range(n_visitors)] + [None], dtype=object), rows),
+        'sessionId': [f"s{i}" for i in rng.integers(0, rows, rows)],
+        'shopifyShopURL': rng.choice(['a.myshopify.com', 'b.myshopify.com', 'c.myshopify.com'], rows),
+        'ip': rng.choice([f"10.{i // 65_536}.{i // 256 % 256}.{i % 256}" for i in range(n_visitors)], rows),
+        'shopifyPageType': rng.choice(['home', 'product', 'collection'], rows),
+        'pageReferrer': rng.choice(np.array(REFERRERS, dtype=object), rows),
+        'utmSource': rng.choice(np.array([None, None, None, 'attentive', 'klaviyo'], dtype=object), rows),
+        'utmMedium': rng.choice(np.array([None, 'email', 'sms'], dtype=object), rows),
+        'utmCampaign': rng.choice(np.array([None, 'bfcm', 'welcome'], dtype=object), rows),
+    })
+    is_order = rng.random(rows) < 1 / 7
+    n_orders = int(is_order.sum())
+    events['shopifyOrderId'] = None
+    events.loc[is_order, 'shopifyOrderId'] = (10 ** 12 + np.arange(n_orders)).astype(str)
+    events.loc[is_order, 'shopifyPageType'] = 'thank_you'
+    processed = pd.to_datetime(events['timestamp'], unit='s').dt.strftime('%Y-%m-%dT%H:%M:%S-04:00')
+    events['shopifyOrderProcessedAt'] = processed.where(is_order, None)
+    events['shopifyOrderTotalPrice'] = pd.Series(rng.random(rows) * 300).round(2).astype(str).where(is_order, None)
+
+    touchpoints = events[is_order].assign(shopifyOrderId=None, shopifyOrderProcessedAt=None, shopifyOrderTotalPrice=None,
+                                          shopifyPageType='product',
+                                          pageReferrer=rng.choice(np.array(REFERRERS, dtype=object), n_orders))
+    return pd.concat([events, touchpoints], ignore_index=True).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def attribution_cjm(orders, rng):
+    lengths = np.minimum(rng.geometric(0.45, orders), 12)
+    return pd.DataFrame({
+        'SHOPIFYORDERID': np.repeat((10 ** 12 + np.arange(orders)).astype(str), lengths),
+        'SHOPIFYSHOPURL': np.repeat(rng.choice(['a.myshopify.com', 'b.myshopify.com', 'c.myshopify.com'], orders), lengths),
+        'TOUCHPOINT_STEP': np.concatenate([np.arange(1, length + 1) for length in lengths]),
+        'ATTRIBUTION_SOURCE': rng.choice(SOURCES, lengths.sum(), p=[.3, .25, .2, .08, .07, .05, .05]),
+    })
+
+
+GENERATORS = {
+    'outbound': outbound,
+    'market': market,
+    'tenants': tenants,
+    'pixel': pixel,
+    'attribution_cjm': attribution_cjm,
+}
+
+
+def generate(table_name, scale=1, seed=0):
+    return GENERATORS[table_name](BASE_ROWS[table_name] * scale, np.random.default_rng(seed))
+
+
+def write_database(path, scale=1, seed=0):
+    """A database.db with every synthetic table at `scale`; returns the tables by name."""
+    if os.path.exists(path):
+        os.remove(path)
+    tables = {name: generate(name, scale, seed) for name in GENERATORS}
+    conn = sqlite3.connect(path)
+    try:
+        for name, df in tables.items():
+            df.to_sql(name, conn, index=False, chunksize=50_000)
+    finally:
+        conn.close()
+    return tables
@@ -1,16 +1,41 @@
+import datetime
+
+import pandas as pd
 import streamlit as st
 
+from core import perf
+
+# Pages share the cached tables of eda.py across sessions as shallow copies; with copy-on-write, a
+# page that adds or overwrites a column copies that column instead of writing into the cached frame
+pd.set_option('mode.copy_on_write', True)
+
 st.set_page_config(page_title="Growth Analytics", layout="wide")
 
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["EDA", "Outbound Sizing", "Attribution Model"])
+show_perf = st.sidebar.toggle("perf", help="Time every data load, transform and chart of each rerun")
+
+started_at = datetime.datetime.now().isoformat(timespec='seconds')
+perf_token = perf.start() if show_perf else None
+try:
+    if page == "EDA":
+        from eda import run_eda
+        run_eda()
+    elif page == "Outbound Sizing":
+        from outbound_sizing import run_outbound_sizing
+        run_outbound_sizing()
+    elif page == "Attribution Model":
+        from attribution import run_attribution
+        run_attribution()
+finally:
+    perf_records = perf.stop(perf_token) if perf_token is not None else None
 
-if page == "EDA":
-    from eda import run_eda
-    run_eda()
-elif page == "Outbound Sizing":
-    from outbound_sizing import run_outbound_sizing
-    run_outbound_sizing()
-elif page == "Attribution Model":
-    from attribution import run_attribution
-    run_attribution()
\ No newline at end of file
+if perf_records is not None:
+    with st.sidebar.expander("perf", expanded=True):
+        perf_frame = perf.to_frame(perf_records)
+        perf_frame['SECTION'] = perf_frame['DEPTH'].fillna(0).astype(int).map(lambda depth: '  ' * depth) + perf_frame['SECTION']
+        st.dataframe(perf_frame.drop(columns='DEPTH').round(3), hide_index=True, use_container_width=True)
+        st.caption("PEAK_MB is traced process-wide and left empty for sections that ran while another session "
+                   "was also recording. Recording slows allocations in every session on this server.")
+        st.download_button("Export JSON", perf.to_json(perf_records, page=page, started_at=started_at),
+                           file_name=f"perf-{started_at}.json", mime='application/json')
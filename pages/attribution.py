@@ -1,11 +1,208 @@
+import os
+import time
 import streamlit as st
-from eda import * 
+import plotly.express as px
+import plotly.graph_objects as go
+import pandas as pd
+from eda import duckdb_error, get_db_path, list_tables, load_table, plotly_chart, shared_view
+from core.query import QueryEngine, page_referrer_contrib
+from core.fetch import FetchError
+from core.perf import section, timed
+from core.attribution_engine import last_touch_attribution
+from core.ingest import DATASET_MANIFEST_FILE, attribution_path, dataset_path, dataset_relation, ensure_pixel_dataset, raw_pixel_path
+from core.materialize import ATTRIBUTION_MANIFEST_FILE, LOOKBACK_DAYS, attribution_table_name, table_path
+from core.multitouch import MODELS, DEFAULT_HALF_LIFE, credit_by_source, compare_models, markov_removal_effects
+from core.journeys import Journeys, PathIndex
+from core.metrics import source_shares
+
+# Raw, flattened pixel events, either ingested from db/Pixel.json into db/pixel/ or stored as a table;
+# when present, attribution is computed locally instead of read from the frozen tables
+PIXEL_TABLE = 'pixel'
+# How long a page waits for an ingestion or refresh held by another worker or the ingest CLI. After
+# that, every session falls back to the frozen attribution tables for PIXEL_LOCK_RETRY seconds
+# rather than have each caller of a rerun wait again
+PIXEL_LOCK_TIMEOUT = 10
+PIXEL_LOCK_RETRY = 60
+_pixel_lock_busy_until = 0.0
+
+
+@st.cache_resource(max_entries=1)
+def _query_engine(db_path, db_mtime):
+    return QueryEngine(db_path)
+
+
+def get_query_engine():
+    db_path = get_db_path()
+    if db_path is None:
+        return None
+    return _query_engine(db_path, os.path.getmtime(db_path))
+
+
+def _pixel_version(db_path):
+    # Signatures of everything ensure_pixel_dataset reads: the raw export and the manifests of the
+    # dataset and of its attribution tables, which other workers or the ingest CLI may update
+    dataset = dataset_path(db_path)
+    signatures = []
+    for path in (raw_pixel_path(db_path), os.path.join(dataset, DATASET_MANIFEST_FILE),
+                 os.path.join(attribution_path(dataset), ATTRIBUTION_MANIFEST_FILE)):
+        try:
+            stat = os.stat(path)
+            signatures.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signatures.append(None)
+    return tuple(signatures)
+
+
+@st.cache_resource(show_spinner="Ingesting pixel events...", max_entries=1)
+def _pixel_dataset(db_path, pixel_version):
+    return ensure_pixel_dataset(db_path, lock_timeout=PIXEL_LOCK_TIMEOUT)
+
+
+def pixel_dataset():
+    """Path of the ingested pixel dataset, brought up to date with db/Pixel.json first; None without one.
+
+    Only checked again once one of the files it depends on changes, so the many callers of a rerun
+    cost a few stat calls."""
+    global _pixel_lock_busy_until
+    db_path = get_db_path()
+    if db_path is None or time.monotonic() < _pixel_lock_busy_until:
+        return None
+    try:
+        return _pixel_dataset(db_path, _pixel_version(db_path))
+    except FetchError:
+        _pixel_lock_busy_until = time.monotonic() + PIXEL_LOCK_RETRY
+        st.warning("Pixel events are being ingested elsewhere; showing the attribution tables frozen in "
+                   "the database until that finishes.")
+        return None
+    except (duckdb_error(), OSError) as e:
+        st.error(f"Failed to ingest pixel events: {e}")
+        return None
+
+
+def pixel_events():
+    """Relation holding the raw pixel events and a version for cache keys, or None without any."""
+    dataset = pixel_dataset()
+    if dataset is not None:
+        return dataset_relation(dataset), os.path.getmtime(os.path.join(dataset, DATASET_MANIFEST_FILE))
+    if PIXEL_TABLE in list_tables():
+        return PIXEL_TABLE, os.path.getmtime(get_db_path())
+    return None
+
+
+def has_pixel_events():
+    return pixel_events() is not None
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _materialized_table(path, mtime):
+    return pd.read_parquet(path)
+
+
+def _refreshed_path(table_name):
+    # Where the attribution table refreshed from the pixel dataset is; None if there is none
+    dataset = pixel_dataset()
+    if dataset is None:
+        return None
+    path = table_path(attribution_path(dataset), table_name)
+    return path if os.path.exists(path) else None
+
+
+def _refreshed_table(table_name):
+    path = _refreshed_path(table_name)
+    if path is None:
+        return None
+    return shared_view(_materialized_table(path, os.path.getmtime(path)))
+
+
+@timed()
+def load_attribution_table(table_name):
+    """orders_month_store, attribution_model_<days> or attribution_cjm: kept current from the pixel
+    dataset when there is one, else as frozen in the database."""
+    refreshed = _refreshed_table(table_name)
+    return refreshed if refreshed is not None else load_table(table_name)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _journeys(source_path, source_mtime):
+    # The source path and mtime are only the cache key, like db_mtime in eda._read_table
+    return Journeys(load_attribution_table('attribution_cjm'))
+
+
+def _journeys_source():
+    path = _refreshed_path('attribution_cjm') or get_db_path()
+    return None if path is None else (path, os.path.getmtime(path))
+
+
+@timed()
+def load_journeys():
+    """attribution_cjm as a compact Journeys index, built once per table version and shared."""
+    source = _journeys_source()
+    if source is None:
+        return Journeys(pd.DataFrame(columns=['SHOPIFYORDERID', 'SHOPIFYSHOPURL', 'TOUCHPOINT_STEP', 'ATTRIBUTION_SOURCE']))
+    return _journeys(*source)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _path_index(source_path, source_mtime):
+    return PathIndex(_journeys(source_path, source_mtime))
+
+
+@timed()
+def load_path_index():
+    """Path counts over load_journeys(), for top-k paths filtered by store and month."""
+    source = _journeys_source()
+    return PathIndex(load_journeys()) if source is None else _path_index(*source)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _markov_attribution(source_path, source_mtime, store):
+    journeys = _journeys(source_path, source_mtime)
+    return markov_removal_effects(journeys, journeys.select(store))
+
+
+@timed()
+def load_markov_attribution(store=None):
+    """Markov removal-effect credit per source over the journeys of `store` (all stores by default)."""
+    source = _journeys_source()
+    if source is None:
+        return markov_removal_effects(load_journeys())
+    return shared_view(_markov_attribution(*source, store))
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _last_touch_attribution(db_path, db_mtime, events, events_version, store):
+    return last_touch_attribution(_query_engine(db_path, db_mtime), events=events, store=store)
+
+
+@timed()
+def load_last_touch_attribution(store=None):
+    """attribution_model_90 computed from the pixel events, for `store` (all stores by default)."""
+    refreshed = _refreshed_table(attribution_table_name(LOOKBACK_DAYS[0]))
+    if refreshed is not None:
+        return refreshed if store is None else refreshed[refreshed['STORE'] == store].reset_index(drop=True)
+    db_path = get_db_path()
+    events = pixel_events()
+    if events is None:
+        return pd.DataFrame()
+    return shared_view(_last_touch_attribution(db_path, os.path.getmtime(db_path), *events, store))
+
 
 def run_attribution():
-    data_frames = load_data()
-    orders_per_month_per_store = data_frames.get('orders_month_store')
-    attribution_model = data_frames.get('attribution_model_90')
-    attribution_cjm = data_frames.get('attribution_cjm')
+    if get_db_path() is None:
+        return  # get_db_path has shown why the database is unavailable
+    orders_per_month_per_store = load_attribution_table('orders_month_store')
+    journeys = load_journeys()
+
+    if has_pixel_events():
+        st.sidebar.subheader('Attribution Settings')
+        stores = sorted(orders_per_month_per_store['STORE'].dropna().unique())
+        selected_store = st.sidebar.selectbox('Select Store', ['All'] + stores)
+        store = None if selected_store == 'All' else selected_store
+        attribution_model = load_last_touch_attribution(store)
+        markov_credit = load_markov_attribution(store)
+    else:
+        attribution_model = load_attribution_table('attribution_model_90')
+        markov_credit = load_markov_attribution()
     
     st.title("Attribution Model Analysis")
     with st.expander("✨ Overview"):
@@ -18,7 +215,8 @@ def run_attribution():
 
     attribution_model['MONTH'] = pd.to_datetime(attribution_model['MONTH'])
     attribution_model['ATTRIBUTED_ORDERS'] = attribution_model['ATTRIBUTED_ORDERS'].astype(int)
-    attribution_model['ATTRIBUTED_REVENUE'] = attribution_model['ATTRIBUTED_REVENUE'].astype(int)
+    # Groups whose every order price fails TRY_CAST sum to NULL when computed from the pixel events
+    attribution_model['ATTRIBUTED_REVENUE'] = attribution_model['ATTRIBUTED_REVENUE'].fillna(0).astype(int)
     
 
     # Plot Orders per month per Store
@@ -30,7 +228,7 @@ def run_attribution():
                 title="Orders per Month per Store",
                 labels={'ORDER_COUNT': 'Total Orders'},
                 color_discrete_sequence=px.colors.qualitative.Pastel)
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
     st.write("The spike in November 2022 is suspected to be due to the enrichment of data thanks to Pixel tool.")
     st.divider()
 
@@ -45,9 +243,9 @@ def run_attribution():
         '<h3> <span style="color: violet;">Referral</span> and <span style="color: #636EFA;">direct</span> are driving orders</h3>', 
         unsafe_allow_html=True
     )
-    order_counts = attribution_model.groupby('ATTRIBUTION_SOURCE')['ATTRIBUTED_ORDERS'].sum().reset_index()
-    total_orders = order_counts['ATTRIBUTED_ORDERS'].sum()
-    order_counts['percentage'] = (order_counts['ATTRIBUTED_ORDERS'] / total_orders) * 100
+    with section('groupby attribution source', rows_in=len(attribution_model)) as record:
+        order_counts = source_shares(attribution_model)
+        record['ROWS_OUT'] = len(order_counts)
     fig2 = px.pie(
         order_counts, 
         names='ATTRIBUTION_SOURCE',
@@ -56,7 +254,28 @@ def run_attribution():
         color='ATTRIBUTION_SOURCE',
         color_discrete_map=color_map 
     )
-    st.plotly_chart(fig2, use_container_width=True)
+    plotly_chart(fig2, use_container_width=True)
+
+    # Data-driven counterpart: Markov removal effects over the ordered journeys
+    markov_share = markov_credit[markov_credit['ATTRIBUTION_SOURCE'].notna()].assign(
+        MODEL='Markov (removal effect)',
+        percentage=lambda df: df['ATTRIBUTED_ORDERS'] / max(df['ATTRIBUTED_ORDERS'].sum(), 1) * 100)
+    comparison = pd.concat([order_counts.assign(MODEL='Last touch'),
+                            markov_share[['ATTRIBUTION_SOURCE', 'MODEL', 'percentage']]])
+    fig_markov = px.bar(
+        comparison,
+        x='ATTRIBUTION_SOURCE',
+        y='percentage',
+        color='MODEL',
+        barmode='group',
+        title="Share of Orders: Last Touch vs Markov Attribution",
+        labels={'ATTRIBUTION_SOURCE': 'Attribution Source', 'percentage': 'Share of Orders (%)', 'MODEL': 'Model'},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    plotly_chart(fig_markov, use_container_width=True)
+    with st.expander("Markov removal effects"):
+        st.write("Conversions lost if every visit to a source led nowhere; credit is split in proportion to it.")
+        st.dataframe(markov_credit.round(3), use_container_width=True, hide_index=True)
 
     # Attribution sankey
     sources = list(attribution_model["ATTRIBUTION_SOURCE"].unique())
@@ -67,7 +286,7 @@ def run_attribution():
         "source": [node_dict[source] for source in attribution_model["ATTRIBUTION_SOURCE"]],
         "target": [node_dict["Purchase"]] * len(attribution_model),
         "value": attribution_model["ATTRIBUTED_ORDERS"].tolist(),
-        "color": [color_map[source] for source in attribution_model["ATTRIBUTION_SOURCE"]]
+        "color": [color_map.get(source, "lightgray") for source in attribution_model["ATTRIBUTION_SOURCE"]]
     }
     fig = go.Figure(go.Sankey(
         node=dict(
@@ -84,7 +303,48 @@ def run_attribution():
             color=links["color"]
         )
     ))
-    st.plotly_chart(fig)
+    plotly_chart(fig)
+
+    # Journey sankey: the most frequent full paths from attribution_cjm, step by step
+    st.subheader("Most Frequent Customer Journeys")
+    path_index = load_path_index()
+    col1, col2, col3 = st.columns(3)
+    journey_store = col1.selectbox('Journey Store', ['All'] + sorted(journeys.stores))
+    journey_month = col2.selectbox('Journey Month', ['All'] + sorted(journeys.months),
+                                   disabled=not len(journeys.months),
+                                   help='Month the order was processed in')
+    top_k = col3.slider('Top Paths', min_value=1, max_value=30, value=10)
+    orders = journeys.select(None if journey_store == 'All' else journey_store,
+                             None if journey_month == 'All' else journey_month)
+    transitions = path_index.transitions(top_k, orders)
+
+    if transitions.empty:
+        st.info("No journeys for this selection.")
+    else:
+        journey_nodes = sorted(set(zip(transitions['SOURCE_STEP'], transitions['SOURCE'].fillna('unknown'))) |
+                               set(zip(transitions['TARGET_STEP'], transitions['TARGET'].fillna('unknown'))),
+                               key=lambda node: (node[0] == 0, node))
+        journey_node_index = {node: i for i, node in enumerate(journey_nodes)}
+        fig = go.Figure(go.Sankey(
+            node=dict(
+                pad=15,
+                thickness=20,
+                line=dict(color="black", width=0.5),
+                label=[source for _, source in journey_nodes],
+                color=[color_map.get(source, "lightgray") for _, source in journey_nodes]
+            ),
+            link=dict(
+                source=[journey_node_index[node] for node in zip(transitions['SOURCE_STEP'], transitions['SOURCE'].fillna('unknown'))],
+                target=[journey_node_index[node] for node in zip(transitions['TARGET_STEP'], transitions['TARGET'].fillna('unknown'))],
+                value=transitions['ORDER_COUNT'].tolist(),
+                color=[color_map.get(source, "lightgray") for source in transitions['SOURCE']]
+            )
+        ))
+        plotly_chart(fig)
+        with st.expander("Top paths"):
+            top_paths = path_index.top_paths(top_k, orders)
+            top_paths['PATH'] = top_paths['PATH'].map(lambda path: ' → '.join(map(str, path)) + ' → Purchase')
+            st.dataframe(top_paths, use_container_width=True, hide_index=True)
     st.divider()
 
     # Plot Orders or Revenue
@@ -116,7 +376,7 @@ def run_attribution():
                 hovermode="x unified",
                 height=600
             )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
 
     elif visualization_dimension == 'Revenue':
@@ -139,16 +399,11 @@ def run_attribution():
                 hovermode="x unified",
                 height=600
             )
-        st.plotly_chart(fig)
+        plotly_chart(fig)
     st.divider()
 
     # Refferal attribution focus
-    PAGEREFERRER_contrib = attribution_model.groupby('PAGEREFERRER').agg(
-        total_orders=('ATTRIBUTED_ORDERS', 'sum'),
-        total_revenue=('ATTRIBUTED_REVENUE', 'sum')
-    ).reset_index()
-
-    PAGEREFERRER_contrib = PAGEREFERRER_contrib.sort_values(by=['total_orders','total_revenue'], ascending=False)
+    PAGEREFERRER_contrib = page_referrer_contrib(get_query_engine(), attribution_model)
 
     toggle = st.radio(
         'Choose which metric to display for Page Referrer:',
@@ -179,7 +434,7 @@ def run_attribution():
                 hovermode="x unified",
                 height=800 
             )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     elif toggle == 'Revenue by Page Referrer':
         fig = px.bar(PAGEREFERRER_contrib, 
@@ -201,12 +456,12 @@ def run_attribution():
                 hovermode="x unified",
                 height=800 
             )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
     st.divider()
 
     # Multi-touch CJM
     # Most common first/last touchpoint?
-    bar_data = attribution_cjm.groupby(['TOUCHPOINT_STEP', 'ATTRIBUTION_SOURCE'])['SHOPIFYORDERID'].nunique().reset_index()
+    bar_data = journeys.step_source_counts()
     bar_data.columns = ['Touchpoint Step', 'Attribution Source', 'Order Count']
 
     fig_bar = px.bar(
@@ -235,24 +490,18 @@ def run_attribution():
     st.markdown('<h3> <span style="color: #636EFA;">Direct</span> orders have more touchpoints, while <span style="color: violet;">referral</span> orders generally occur at initial visit </h3>', 
         unsafe_allow_html=True
     )
-    st.plotly_chart(fig_bar)
+    plotly_chart(fig_bar)
     st.divider()
 
     # What touch drives conversion?
-    attribution_cjm['TOUCHPOINT_STEP'] = pd.to_numeric(attribution_cjm['TOUCHPOINT_STEP'], errors='coerce')
-    attribution_sources = attribution_cjm['ATTRIBUTION_SOURCE'].unique()
+    attribution_sources = [source for source in journeys.sources if pd.notna(source)]
     selected_source = st.selectbox(
         'Select Attribution Sources',
         options=attribution_sources,
         index=0
     )
 
-    filtered_data = attribution_cjm[
-        attribution_cjm['SHOPIFYORDERID'].notnull() &
-        attribution_cjm['ATTRIBUTION_SOURCE'].isin([selected_source]) &
-        (attribution_cjm['TOUCHPOINT_STEP'] < 10) 
-    ]
-    funnel_data = filtered_data.groupby('TOUCHPOINT_STEP')['SHOPIFYORDERID'].nunique().reset_index()
+    funnel_data = journeys.source_funnel(selected_source, max_step=9)
     funnel_data.columns = ['Touchpoint Step', 'Order Count']
     funnel_color = color_map.get(selected_source, 'lightblue')
     fig_funnel = go.Figure(go.Funnel(
@@ -282,7 +531,35 @@ def run_attribution():
         st.markdown('<h3> Unlike <span style="color: rgb(17, 119, 51);">Google</span> orders, <span style="color: rgb(153,153,51);">Facebook</span> ads are not successful at producing orders </h3>', 
             unsafe_allow_html=True
         )
-    st.plotly_chart(fig_funnel)
+    plotly_chart(fig_funnel)
+    st.divider()
+
+    # Multi-touch models over the same journeys
+    st.subheader("Order Credit by Attribution Model")
+    model_labels = {label: model for model, label in MODELS.items()}
+    selected_model = model_labels[st.selectbox(
+        'Select Attribution Model',
+        list(model_labels),
+        help='How the credit for each order is split across the touchpoints of its journey'
+    )]
+    half_life = DEFAULT_HALF_LIFE
+    if selected_model == 'time_decay':
+        half_life = st.slider('Half-life (touchpoints before the order)', min_value=0.5, max_value=10.0,
+                              value=DEFAULT_HALF_LIFE, step=0.5,
+                              help='A touchpoint this many steps before the order gets half the credit of the last one')
+    model_credit = credit_by_source(journeys, selected_model, half_life)
+    fig_models = px.bar(
+        model_credit.sort_values('ATTRIBUTED_ORDERS', ascending=False),
+        x='ATTRIBUTION_SOURCE',
+        y='ATTRIBUTED_ORDERS',
+        color='ATTRIBUTION_SOURCE',
+        title=f"Orders Credited by Source ({MODELS[selected_model]})",
+        labels={'ATTRIBUTION_SOURCE': 'Attribution Source', 'ATTRIBUTED_ORDERS': 'Credited Orders'},
+        color_discrete_map=color_map
+    )
+    plotly_chart(fig_models, use_container_width=True)
+    with st.expander("Compare all models"):
+        st.dataframe(compare_models(journeys, half_life).round(1), use_container_width=True)
     st.divider()
 
     st.subheader("Key Take-aways")
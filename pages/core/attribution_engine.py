@@ -0,0 +1,279 @@
+import contextlib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .query import QueryEngine
+
+# Local DuckDB port of querires/queries.sql. The Snowflake queries read DATA:<field> off the raw
+# pixel table; here they run over a flattened pixel events relation with one column per field.
+
+PIXEL_COLUMNS = [
+    'timestamp', 'userId', 'sessionId', 'shopifyShopURL', 'ip', 'shopifyPageType',
+    'shopifyOrderId', 'shopifyOrderProcessedAt', 'shopifyOrderTotalPrice',
+    'pageReferrer', 'utmSource', 'utmMedium', 'utmCampaign',
+]
+
+ATTRIBUTION_COLUMNS = [
+    'STORE', 'MONTH', 'ATTRIBUTION_SOURCE', 'PAGEREFERRER', 'MEDIUM', 'CAMPAIGN',
+    'ATTRIBUTED_ORDERS', 'ATTRIBUTED_REVENUE',
+]
+
+# Month of an order, from the date part of shopifyOrderProcessedAt
+ORDER_MONTH = "DATE_TRUNC('month', TRY_CAST(LEFT(CAST(shopifyOrderProcessedAt AS VARCHAR), 10) AS DATE))"
+
+# ROW_NUMBER() in Snowflake breaks timestamp ties arbitrarily; every remaining column is used
+# as a tie-break here so the winning touchpoint per order is deterministic.
+LAST_TOUCH_ORDER = """
+    touchpoint_timestamp DESC, attribution_source, pageReferrer, utmMedium, utmCampaign,
+    touchpoint_user_id, shopifyShopURL, shopifyOrderProcessedAt, shopifyOrderTotalPrice, order_user_id
+"""
+
+ORDER_EVENTS = """
+order_events AS (
+  SELECT
+    CAST("timestamp" AS BIGINT) AS timestamp,
+    userId,
+    sessionId,
+    shopifyShopURL,
+    ip AS ip_address,
+    shopifyOrderId,
+    shopifyOrderProcessedAt,
+    TRY_CAST(shopifyOrderTotalPrice AS DECIMAL(18, 2)) AS shopifyOrderTotalPrice
+  FROM {events}
+  WHERE shopifyOrderId IS NOT NULL
+    AND ($store::VARCHAR IS NULL OR shopifyShopURL = $store)
+)
+"""
+
+TOUCHPOINT_EVENTS = """
+touchpoint_events AS (
+  SELECT
+    CAST("timestamp" AS BIGINT) AS timestamp,
+    userId,
+    sessionId,
+    shopifyShopURL,
+    ip AS ip_address,
+    COALESCE(utmSource,
+      CASE
+        WHEN pageReferrer IS NULL OR pageReferrer = '' THEN 'direct'
+        WHEN pageReferrer LIKE '%google%' THEN 'google'
+        WHEN pageReferrer LIKE '%facebook%' THEN 'facebook'
+        WHEN pageReferrer LIKE '%instagram%' THEN 'instagram'
+        ELSE 'referral'
+      END) AS attribution_source,
+    pageReferrer,
+    utmMedium,
+    utmCampaign
+  FROM {events}
+  WHERE {touchpoint_filter}
+)
+"""
+
+STORE_FILTER = "($store::VARCHAR IS NULL OR shopifyShopURL = $store)"
+
+# Final report by source, medium, campaign over last_click_attribution
+ATTRIBUTION_REPORT = """
+SELECT
+  shopifyShopURL AS STORE,
+  {order_month} AS MONTH,
+  attribution_source AS ATTRIBUTION_SOURCE,
+  pageReferrer AS PAGEREFERRER,
+  COALESCE(utmMedium, 'none') AS MEDIUM,
+  COALESCE(utmCampaign, 'none') AS CAMPAIGN,
+  COUNT(DISTINCT shopifyOrderId) AS ATTRIBUTED_ORDERS,
+  SUM(shopifyOrderTotalPrice) AS ATTRIBUTED_REVENUE
+FROM last_click_attribution
+GROUP BY 1, 2, 3, 4, 5, 6
+ORDER BY STORE, MONTH, ATTRIBUTED_ORDERS DESC, ATTRIBUTION_SOURCE, PAGEREFERRER, MEDIUM, CAMPAIGN
+"""
+
+LAST_TOUCH_SQL = """
+WITH {order_events}
+,{touchpoint_events}
+,customer_journey AS (
+  SELECT
+    o.shopifyOrderId,
+    o.shopifyShopURL,
+    o.shopifyOrderProcessedAt,
+    o.shopifyOrderTotalPrice,
+    o.userId AS order_user_id,
+    t.userId AS touchpoint_user_id,
+    t.timestamp AS touchpoint_timestamp,
+    t.attribution_source,
+    t.pageReferrer,
+    t.utmMedium,
+    t.utmCampaign,
+    CASE
+      WHEN o.userId = t.userId THEN 'userId_match'
+      WHEN (o.ip_address = t.ip_address AND o.timestamp = t.timestamp) THEN 'ip_match'
+      ELSE 'no_match'
+    END AS match_type,
+  FROM order_events o
+  JOIN touchpoint_events t
+    ON (o.ip_address = t.ip_address AND o.timestamp = t.timestamp)
+    AND o.shopifyShopURL = t.shopifyShopURL
+  WHERE t.timestamp <= o.timestamp
+)
+,last_click_attribution AS (
+  SELECT *
+  FROM customer_journey
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY shopifyOrderId ORDER BY {last_touch_order}) = 1
+)
+{report}
+"""
+
+CUSTOMER_JOURNEY_SQL = """
+WITH {order_events}
+,{touchpoint_events}
+,customer_journey AS (
+  SELECT
+    o.shopifyOrderId,
+    o.shopifyShopURL,
+    o.shopifyOrderProcessedAt,
+    t.timestamp AS touchpoint_timestamp,
+    t.attribution_source,
+    ROW_NUMBER() OVER (
+      PARTITION BY o.shopifyOrderId
+      ORDER BY t.timestamp, t.attribution_source, o.shopifyShopURL
+    ) AS touchpoint_step
+  FROM order_events o
+  JOIN touchpoint_events t
+    ON o.ip_address = t.ip_address AND o.timestamp = t.timestamp
+  WHERE t.timestamp <= o.timestamp
+)
+SELECT
+  shopifyOrderId AS SHOPIFYORDERID,
+  shopifyShopURL AS SHOPIFYSHOPURL,
+  touchpoint_step AS TOUCHPOINT_STEP,
+  attribution_source AS ATTRIBUTION_SOURCE,
+  STRFTIME({order_month}, '%Y-%m-%d') AS MONTH
+FROM customer_journey
+ORDER BY SHOPIFYORDERID, TOUCHPOINT_STEP
+"""
+
+ORDERS_MONTH_STORE_SQL = """
+SELECT
+  shopifyShopURL AS STORE,
+  STRFTIME({order_month}, '%Y-%m-%d') AS MONTH,
+  COUNT(DISTINCT shopifyOrderId) AS ORDER_COUNT
+FROM {events}
+WHERE shopifyPageType = 'thank_you'
+  AND ($store::VARCHAR IS NULL OR shopifyShopURL = $store)
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+
+
+# Stores with orders; events without a store never match a touchpoint and are left out
+STORES_SQL = """
+SELECT DISTINCT shopifyShopURL AS STORE
+FROM {events}
+WHERE shopifyShopURL IS NOT NULL
+  AND (shopifyOrderId IS NOT NULL OR shopifyPageType = 'thank_you')
+ORDER BY 1
+"""
+
+
+def _render(sql, events, touchpoint_filter=STORE_FILTER, **parts):
+    return sql.format(
+        order_events=ORDER_EVENTS.format(events=events).strip(),
+        touchpoint_events=TOUCHPOINT_EVENTS.format(events=events, touchpoint_filter=touchpoint_filter).strip(),
+        last_touch_order=LAST_TOUCH_ORDER.strip(),
+        report=ATTRIBUTION_REPORT.format(order_month=ORDER_MONTH).strip(),
+        order_month=ORDER_MONTH,
+        events=events,
+        **parts,
+    )
+
+
+def _tables(events):
+    # Bare names are snapshot tables; anything else (a read_parquet(...) call, a view) is used as-is
+    return [events] if events.isidentifier() else []
+
+
+def last_touch_attribution(engine: QueryEngine, events='pixel', store=None):
+    """Last-touch attribution per store/month/source, as the attribution_model_<lookback> tables.
+
+    As in queries.sql, touchpoints are matched to an order on (store, ip, timestamp) equality, so
+    every matched touchpoint is at the order's own timestamp and no lookback window can exclude one:
+    attribution_model_90 and attribution_model_180 are the same table, and there is no lookback
+    parameter. The equality match also lets DuckDB plan the order x touchpoint join as a hash join,
+    linear in the events.
+    """
+    params = {'store': store}
+    return engine.query(_render(LAST_TOUCH_SQL, events), params, tables=_tables(events))
+
+
+def customer_journeys(engine: QueryEngine, events='pixel', store=None):
+    """Ordered touchpoints per order, as the attribution_cjm table plus the order MONTH.
+
+    `store` selects orders; as in queries.sql, their touchpoints are matched on ip and timestamp
+    across every store.
+    """
+    sql = _render(CUSTOMER_JOURNEY_SQL, events, touchpoint_filter='TRUE')
+    return engine.query(sql, {'store': store}, tables=_tables(events))
+
+
+def orders_per_month(engine: QueryEngine, events='pixel', store=None):
+    """Distinct thank-you page orders per store and month, as the orders_month_store table."""
+    return engine.query(_render(ORDERS_MONTH_STORE_SQL, events), {'store': store}, tables=_tables(events))
+
+
+def list_stores(engine: QueryEngine, events='pixel'):
+    return engine.query(STORES_SQL.format(events=events), tables=_tables(events))['STORE'].tolist()
+
+
+@contextlib.contextmanager
+def partitioned_by_store(engine: QueryEngine, events='pixel'):
+    """Copy `events` into a table clustered by store for the duration of the block; yields its relation.
+
+    DuckDB keeps min/max statistics per row group, so a per-store query on it only reads that
+    store's row groups instead of scanning every event again.
+    """
+    table_name = f"events_by_store_{uuid.uuid4().hex}"
+    engine.query(f'CREATE TABLE "{table_name}" AS SELECT * FROM {events} ORDER BY shopifyShopURL',
+                 tables=_tables(events))
+    try:
+        yield f'(SELECT * FROM "{table_name}")'
+    finally:
+        engine.query(f'DROP TABLE IF EXISTS "{table_name}"')
+
+
+# Row order of each result, restored after the per-store shards are concatenated
+SHARD_ORDER = {
+    'last_touch_attribution': None,  # already sorted by store first
+    'orders_per_month': None,
+    'customer_journeys': ['SHOPIFYORDERID', 'TOUCHPOINT_STEP'],
+}
+
+
+def by_store(engine: QueryEngine, compute, events='pixel', stores=None, max_workers=None, **kwargs):
+    """Run `compute` (last_touch_attribution, customer_journeys or orders_per_month) once per store
+    on a thread pool and concatenate the shards into the frame `compute` returns for all stores.
+
+    Every join and ranking stays within a store's orders (Shopify order ids are global), so the
+    shards are independent; each runs on its own DuckDB cursor. Use over `partitioned_by_store`
+    so shards do not each rescan all events. Per-shard timings are returned in `attrs['shard_timings']`.
+    """
+    stores = list_stores(engine, events) if stores is None else list(stores)
+    if not stores:
+        return compute(engine, events, **kwargs)
+
+    def run(store):
+        start = time.perf_counter()
+        df = compute(engine, events, store=store, **kwargs)
+        return df, {'STORE': store, 'ROWS': len(df), 'SECONDS': time.perf_counter() - start}
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        shards = list(pool.map(run, stores))
+    # Empty shards are left out so they cannot widen the column dtypes
+    frames = [shard for shard, _ in shards if not shard.empty] or [shards[0][0]]
+    df = pd.concat(frames, ignore_index=True)
+    order = SHARD_ORDER[compute.__name__]
+    if order:
+        df = df.sort_values(order, kind='stable', ignore_index=True)
+    df.attrs['shard_timings'] = pd.DataFrame([timing for _, timing in shards])
+    return df
@@ -0,0 +1,141 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from .perf import timed
+
+# Figure builders shared by the pages. They take already-filtered frames and return plotly figures.
+
+
+def _segments(start, end):
+    # [start_0, end_0, None, start_1, end_1, None, ...]: one trace draws many disconnected segments
+    points = np.empty(len(start) * 3, dtype=object)
+    points[0::3] = start
+    points[1::3] = end
+    points[2::3] = None
+    return points
+
+
+@timed()
+def campaign_timeline_figure(df, metric):
+    """One line segment per campaign from start to last date, batched into a trace per campaign group."""
+    fig = go.Figure()
+    color_cycle = itertools.cycle(px.colors.qualitative.Set3 + px.colors.qualitative.Dark24)
+    campaign_colors = {group: next(color_cycle) for group in df['CAMPAIGN_GROUP'].unique()}
+    line_styles = itertools.cycle(["solid", "dot", "dash", "longdash", "dashdot"])
+
+    hover_text = (
+        "Start: " + df['CAMPAIGN_START_DATE'].astype(str)
+        + "<br>End: " + df['CAMPAIGN_LAST_DATE'].astype(str)
+        + f"<br>{metric}: " + df[metric].astype(str)
+    )
+    for campaign_group, group_data in df.groupby('CAMPAIGN_GROUP', observed=True):
+        values = group_data[metric].to_numpy()
+        group_hover = hover_text.loc[group_data.index].to_numpy()
+        fig.add_trace(go.Scatter(
+            x=_segments(group_data['CAMPAIGN_START_DATE'].to_numpy(), group_data['CAMPAIGN_LAST_DATE'].to_numpy()),
+            y=_segments(values, values),
+            mode='lines+markers',
+            name=str(campaign_group),
+            line=dict(color=campaign_colors[campaign_group], dash=next(line_styles)),
+            hoverinfo="text",
+            hovertext=_segments(group_hover, group_hover),
+        ))
+    fig.update_layout(
+        title=f"{metric} Over Time by Campaign Group",
+        xaxis_title="Campaign Date Range",
+        yaxis_title=metric,
+        xaxis=dict(
+            tickangle=-45,
+            rangeslider=dict(
+                visible=True,
+                thickness=0.05,
+            ),
+            type='date',
+        ),
+        hovermode="x unified",
+        height=800
+    )
+    return fig
+
+
+# Above this many rows, scatter/box/bar figures are reduced server-side before they are serialized:
+# plotly otherwise ships every row to the browser.
+MAX_CHART_ROWS = 5000
+SCATTER_BINS = 80
+TOP_N_BARS = 30
+OTHER_LABEL = 'Other'
+
+
+def binned_scatter_data(df, x, y, color=None, bins=SCATTER_BINS):
+    """Aggregate points into a bins x bins grid (per color), keeping the count and mean position per cell."""
+    data = pd.DataFrame({x: df[x], y: df[y]}).astype(float)
+    if color:
+        data[color] = df[color]
+    data = data.dropna(subset=[x, y])
+    keys = [color] if color else []
+    for axis in (x, y):
+        low, high = data[axis].min(), data[axis].max()
+        span = (high - low) or 1.0
+        keys.append(np.minimum(((data[axis] - low) / span * bins).astype(int), bins - 1).rename(f"{axis}_bin"))
+    reduced = data.groupby(keys, observed=True, sort=False).agg(
+        **{x: (x, 'mean'), y: (y, 'mean'), 'count': (x, 'size')}
+    )
+    return reduced.reset_index(level=color).reset_index(drop=True) if color else reduced.reset_index(drop=True)
+
+
+@timed()
+def scatter_figure(df, x, y, color=None, max_rows=None, **kwargs):
+    if len(df) <= (max_rows or MAX_CHART_ROWS):
+        return px.scatter(df, x=x, y=y, color=color, **kwargs)
+    kwargs.pop('hover_data', None)
+    reduced = binned_scatter_data(df, x, y, color)
+    fig = px.scatter(reduced, x=x, y=y, color=color, size='count', hover_data=['count'], **kwargs)
+    fig.update_layout(title=f"{fig.layout.title.text} (binned from {len(df):,} rows)")
+    return fig
+
+
+def box_stats(df, x, y):
+    """Per-group quartiles and Tukey fences, enough for plotly to draw the box without the raw points."""
+    grouped = df.dropna(subset=[y]).groupby(x, observed=True, sort=True)[y]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    stats['min'], stats['max'] = grouped.min(), grouped.max()
+    iqr = stats['q3'] - stats['q1']
+    stats['lowerfence'] = np.maximum(stats['q1'] - 1.5 * iqr, stats['min'])
+    stats['upperfence'] = np.minimum(stats['q3'] + 1.5 * iqr, stats['max'])
+    return stats.reset_index()
+
+
+@timed()
+def box_figure(df, x, y, max_rows=None, title=None, labels=None):
+    if len(df) <= (max_rows or MAX_CHART_ROWS):
+        return px.box(df, x=x, y=y, title=title, labels=labels)
+    stats = box_stats(df, x, y)
+    fig = go.Figure(go.Box(
+        x=stats[x].astype(str),
+        q1=stats['q1'], median=stats['median'], q3=stats['q3'],
+        lowerfence=stats['lowerfence'], upperfence=stats['upperfence'],
+        name=y,
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=(labels or {}).get(y, y))
+    return fig
+
+
+def top_n_with_other(df, x, y, n=TOP_N_BARS):
+    """Sum `y` per `x`, keep the n largest and fold the rest into a single 'Other' bar."""
+    totals = df.groupby(x, observed=True)[y].sum().sort_values(ascending=False)
+    if len(totals) > n:
+        totals = pd.concat([totals.iloc[:n], pd.Series({OTHER_LABEL: totals.iloc[n:].sum()})])
+    totals.index = totals.index.astype(str)
+    return totals.rename_axis(x).reset_index(name=y)
+
+
+@timed()
+def bar_figure(df, x, y, max_rows=None, **kwargs):
+    if len(df) <= (max_rows or MAX_CHART_ROWS):
+        return px.bar(df, x=x, y=y, **kwargs)
+    return px.bar(top_n_with_other(df, x, y), x=x, y=y, **kwargs)
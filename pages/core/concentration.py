@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Concentration of outbound metrics across campaigns: Pareto curves (the 80/20 chart), Lorenz
+# curves and Gini coefficients, and how many campaigns make up a given share of the total. Every
+# measure comes from one sort and cumsum in NumPy, over one metric or a column per metric at once;
+# missing values count as 0.
+
+DEFAULT_SHARE = 0.8
+SWEEP_SHARES = (0.5, 0.8, 0.9, 0.95)
+TOP_LABEL = 'Top {share:.0%}'
+OTHER_LABEL = 'Other'
+
+
+def _metric_values(df, metrics):
+    return df[metrics].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, na_value=0.0)
+
+
+def _grouped(df, metrics, by=None):
+    # One row per value of `by` with the metrics summed, or the rows of df as they are
+    if by is None:
+        return df
+    return df.groupby(by, observed=True, sort=False)[metrics].sum().reset_index()
+
+
+def pareto(df, metric, by=None):
+    """Rows of df (or their `by` groups) by `metric`, largest first, with CUMULATIVE, CUMULATIVE_SHARE
+    (of the metric total) and RANK_SHARE (of the rows) for the Pareto curve."""
+    df = _grouped(df, [metric], by)
+    values = _metric_values(df, [metric])[:, 0]
+    order = np.argsort(-values, kind='stable')
+    cumulative = np.cumsum(values[order])
+    total = cumulative[-1] if len(cumulative) else 0.0
+    result = df.iloc[order].reset_index(drop=True)
+    result['CUMULATIVE'] = cumulative
+    result['CUMULATIVE_SHARE'] = cumulative / total if total else np.zeros(len(cumulative))
+    result['RANK_SHARE'] = np.arange(1, len(result) + 1) / max(len(result), 1)
+    return result
+
+
+def top_labels(pareto_df, share=DEFAULT_SHARE):
+    """TOP_LABEL for the rows whose cumulative total stays within `share` of the whole, else OTHER_LABEL."""
+    return np.where(pareto_df['CUMULATIVE_SHARE'].to_numpy() <= share, TOP_LABEL.format(share=share), OTHER_LABEL)
+
+
+def lorenz_curve(df, metric, by=None):
+    """Cumulative share of rows against cumulative share of `metric`, smallest first, from (0, 0)."""
+    values = np.sort(_metric_values(_grouped(df, [metric], by), [metric])[:, 0])
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    total = cumulative[-1]
+    return pd.DataFrame({
+        'POPULATION_SHARE': np.linspace(0, 1, len(cumulative)),
+        'VALUE_SHARE': cumulative / total if total else np.zeros(len(cumulative)),
+    })
+
+
+def concentration_summary(df, metrics, by=None, shares=SWEEP_SHARES):
+    """One row per metric: its total, Gini coefficient, and the share of rows holding each of `shares`
+    of the total (counted as the Pareto chart labels them), all metrics in one pass."""
+    values = _metric_values(_grouped(df, metrics, by), metrics)
+    n = len(values)
+    ascending = np.sort(values, axis=0)
+    totals = ascending.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Gini = 1 - 2 * (area under the Lorenz curve), by the trapezoid rule over the sorted values
+        lorenz_area = (np.cumsum(ascending, axis=0).sum(axis=0) - totals / 2) / (n * totals)
+        gini = np.where(totals > 0, 1 - 2 * lorenz_area, np.nan)
+        descending_share = np.cumsum(ascending[::-1], axis=0) / totals
+    summary = pd.DataFrame({'METRIC': metrics, 'TOTAL': totals, 'GINI': gini})
+    for share in shares:
+        in_top = (descending_share <= share).sum(axis=0)
+        summary[f"ROWS_FOR_{share:.0%}"] = np.where(totals > 0, in_top / max(n, 1), np.nan)
+    return summary
@@ -0,0 +1,143 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Streaming download used to fetch db/database.db on a fresh container. The file is written to
+# <dest>.part in chunks, resumed with an HTTP Range request after a dropped connection, checked,
+# and only then renamed into place. A lock file makes concurrent workers wait for a single download.
+
+# A dropped connection loses at most the chunk being read; everything written before it is resumed from
+CHUNK_SIZE = 1 << 16
+# The part file is fsynced every this many bytes, so a killed worker also leaves what it received on disk
+SYNC_SIZE = 1 << 22
+HASH_CHUNK_SIZE = 1 << 20
+TIMEOUT = (10, 60)  # (connect, read) seconds
+RETRIES = 3
+BACKOFF = 2.0
+
+
+class FetchError(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout=600, poll=0.5):
+    """Exclusive cross-process lock on `path`; released by the OS if the holder dies."""
+    handle = open(path, 'a+')
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise FetchError(f"Timed out waiting for lock {path}")
+                time.sleep(poll)
+        yield
+    finally:
+        handle.close()
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_sqlite_database(path):
+    with open(path, 'rb') as f:
+        if f.read(16) != b'SQLite format 3\x00':
+            return False
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute('PRAGMA quick_check').fetchone()[0] == 'ok'
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def _expected_size(response, offset):
+    # Content-Range: bytes <start>-<end>/<total> on a 206; Content-Length of the whole body on a 200
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if 'Content-Length' in response.headers:
+        return offset + int(response.headers['Content-Length'])
+    return None
+
+
+def _download(session, url, part_path, timeout, chunk_size):
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # Nothing left to fetch past our offset; let the checks below decide if the file is whole
+            return
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            offset = 0  # the server ignored the Range header and is sending the whole file
+        expected_size = _expected_size(response, offset)
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            unsynced = 0
+            try:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    f.flush()
+                    unsynced += len(chunk)
+                    if unsynced >= SYNC_SIZE:
+                        os.fsync(f.fileno())
+                        unsynced = 0
+            finally:
+                os.fsync(f.fileno())
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        raise FetchError(f"Incomplete download: {size} of {expected_size} bytes")
+
+
+def fetch_file(url, dest, sha256=None, validate=None, session=None,
+               retries=RETRIES, timeout=TIMEOUT, chunk_size=CHUNK_SIZE, backoff=BACKOFF):
+    """Download `url` to `dest` unless another worker already has; returns `dest`.
+
+    `sha256` pins the expected digest; `validate(path)` is an extra check on the finished file.
+    A download that fails either check is discarded rather than resumed.
+    """
+    import requests  # only needed when something is downloaded; keeps it off the startup path
+
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    part_path = f"{dest}.part"
+    session = session or requests.Session()
+
+    with file_lock(f"{dest}.lock"):
+        if os.path.exists(dest):
+            return dest
+        error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * attempt)
+            try:
+                _download(session, url, part_path, timeout, chunk_size)
+            except (requests.RequestException, FetchError) as e:
+                error = e
+                continue
+            if (sha256 and sha256_of(part_path) != sha256.lower()) or (validate and not validate(part_path)):
+                os.remove(part_path)
+                error = FetchError(f"Downloaded file from {url} failed verification")
+                continue
+            os.replace(part_path, dest)
+            return dest
+        raise FetchError(f"Failed to download {url} after {retries + 1} attempts: {error}")
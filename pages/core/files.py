@@ -0,0 +1,36 @@
+import contextlib
+import json
+import os
+import threading
+
+# Writes that other workers may read while they happen: snapshots, pixel dataset manifests and the
+# attribution tables. Each file is written beside its target and renamed over it, so a reader sees
+# either the previous file or the whole new one.
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Yield a temporary path to write; it replaces `path` once the block completes, and is removed
+    if the block raises."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path, payload):
+    with atomic_write(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+
+
+def read_json(path):
+    """The JSON document at `path`, or None if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
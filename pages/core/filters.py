@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """Per-column value codes and row positions per value, built once per dataset.
+
+    A combination of sidebar filters resolves by taking the positions of the most selective
+    filter and checking the remaining filters on those rows only, instead of rescanning the frame.
+    """
+
+    def __init__(self, df, columns):
+        self.n_rows = len(df)
+        self._codes = {}
+        self._lookup = {}
+        self._counts = {}
+        self._positions = {}
+        for col in columns:
+            codes, uniques = pd.factorize(df[col])
+            # A stable sort keeps positions ascending within each value. Missing values get
+            # code -1 and sort first; they are not reachable through any value
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            bounds = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+            self._codes[col] = codes
+            self._lookup[col] = {value: code for code, value in enumerate(uniques)}
+            self._counts[col] = counts
+            self._positions[col] = [order[bounds[code]:bounds[code + 1]] for code in range(len(uniques))]
+
+    def values(self, col):
+        return list(self._lookup[col])
+
+    def _selected_codes(self, col, value):
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        return np.array([self._lookup[col][v] for v in values if v in self._lookup[col]], dtype=np.intp)
+
+    def select(self, **selections):
+        """Sorted positions of rows matching every selection; None leaves a column unfiltered."""
+        active = {col: self._selected_codes(col, value) for col, value in selections.items() if value is not None}
+        if not active:
+            return np.arange(self.n_rows)
+
+        # Start from the filter with the fewest matching rows
+        first = min(active, key=lambda col: self._counts[col][active[col]].sum())
+        parts = [self._positions[first][code] for code in active.pop(first)]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        result = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+        for col, codes in active.items():
+            # Membership table indexed by code + 1, so missing values (code -1) map to False
+            allowed = np.zeros(len(self._counts[col]) + 1, dtype=bool)
+            allowed[codes + 1] = True
+            result = result[allowed[self._codes[col][result] + 1]]
+        return result
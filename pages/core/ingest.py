@@ -0,0 +1,251 @@
+import os
+import shutil
+import uuid
+
+from .attribution_engine import PIXEL_COLUMNS
+from .fetch import file_lock
+from .files import read_json, write_json
+from .materialize import ATTRIBUTION_FOLDER, is_refreshed, refresh_attribution
+from .query import QueryEngine
+
+# Ingestion of raw pixel exports (Pixel.json: NDJSON or a JSON array of PIXEL rows) into a Parquet
+# dataset at db/pixel/, partitioned by event month. DuckDB streams the JSON and the COPY, so memory
+# stays bounded by MEMORY_LIMIT whatever the size of the dump. Each row is flattened to the
+# DATA:<field> columns queries.sql reads; attribution_engine runs over the result as is.
+#
+# The manifest keeps the latest event timestamp ingested (the watermark). Later exports are appended:
+# only their events past the watermark are written, as new files in the month partitions.
+
+PIXEL_DATASET = 'pixel'
+RAW_PIXEL_FILE = 'Pixel.json'
+PARTITION_COLUMN = 'event_month'
+DATASET_MANIFEST_FILE = '_manifest.json'
+# Bump whenever FLATTEN_SQL or the manifest change, so datasets written by older code are rebuilt
+DATASET_VERSION = 2
+MEMORY_LIMIT = '1GB'
+
+# DATA is a nested object in Snowflake JSON exports and a JSON-encoded string in CSV-style ones;
+# rows without a DATA wrapper are taken as already flat. Events without a timestamp cannot be placed
+# against the watermark (nor attributed) and are skipped.
+FLATTEN_SQL = """
+WITH raw AS (
+  SELECT COALESCE(json->'DATA', json->'data', json) AS data
+  FROM read_json_objects({sources}, format = 'auto')
+),
+events AS (
+  SELECT CASE WHEN json_type(data) = 'VARCHAR' THEN (data->>'$')::JSON ELSE data END AS data
+  FROM raw
+),
+flat AS (
+  SELECT
+    TRY_CAST(data->>'timestamp' AS BIGINT) AS "timestamp",
+    {fields}
+  FROM events
+)
+SELECT *, STRFTIME(TO_TIMESTAMP("timestamp"), '%Y-%m') AS {partition}
+FROM flat
+WHERE "timestamp" IS NOT NULL
+"""
+
+# Events past the watermark, plus events at it that are not in the dataset yet: consecutive exports
+# are usually cut at a timestamp, so the last second can be split across two files
+APPEND_SQL = """
+WITH incoming AS ({flatten})
+SELECT * FROM incoming WHERE "timestamp" > {watermark}
+UNION ALL
+(
+  SELECT * FROM incoming WHERE "timestamp" = {watermark}
+  EXCEPT ALL
+  SELECT * FROM {dataset} WHERE "timestamp" = {watermark}
+)
+"""
+
+
+def dataset_path(db_path, name=PIXEL_DATASET):
+    return os.path.join(os.path.dirname(db_path), name)
+
+
+def raw_pixel_path(db_path):
+    return os.path.join(os.path.dirname(db_path), RAW_PIXEL_FILE)
+
+
+def attribution_path(path):
+    return os.path.join(os.path.dirname(path), ATTRIBUTION_FOLDER)
+
+
+def dataset_relation(path):
+    """The dataset at `path` as a DuckDB relation, e.g. for attribution_engine's `events`."""
+    glob = os.path.join(path, '**', '*.parquet').replace("'", "''")
+    return (f"read_parquet('{glob}', hive_partitioning = true, "
+            f"hive_types = {{'{PARTITION_COLUMN}': VARCHAR}})")
+
+
+def _source_signature(source):
+    stat = os.stat(source)
+    return {'path': os.path.abspath(source), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def read_dataset_manifest(path):
+    manifest = read_json(os.path.join(path, DATASET_MANIFEST_FILE))
+    return manifest if manifest and manifest.get('version') == DATASET_VERSION else None
+
+
+def _write_dataset_manifest(path, manifest):
+    write_json(os.path.join(path, DATASET_MANIFEST_FILE), manifest)
+
+
+def is_current(path, sources):
+    """Whether every one of `sources`, as it is now, has been ingested into the dataset."""
+    manifest = read_dataset_manifest(path)
+    return manifest is not None and all(_source_signature(source) in manifest['sources'] for source in sources)
+
+
+def _sql_list(values):
+    return "[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+def flatten_sql(sources):
+    fields = ",\n    ".join(f"data->>'{col}' AS \"{col}\"" for col in PIXEL_COLUMNS if col != 'timestamp')
+    return FLATTEN_SQL.format(sources=_sql_list(sources), fields=fields, partition=PARTITION_COLUMN)
+
+
+def _copy(sql, target, batch, memory_limit):
+    """Write the result of `sql` to `target`, partitioned; returns (rows, min timestamp, max timestamp)."""
+    import duckdb  # imported on the first ingestion rather than at startup
+
+    conn = duckdb.connect()
+    try:
+        conn.execute(f"SET memory_limit = '{memory_limit}'")
+        # Lets the COPY stream rows to the partitions instead of buffering them to keep input order
+        conn.execute("SET preserve_insertion_order = false")
+        conn.execute(f"SET temp_directory = '{target}.spill'")
+        target_sql = target.replace("'", "''")
+        rows = conn.execute(
+            f"COPY ({sql}) TO '{target_sql}' "
+            f"(FORMAT parquet, PARTITION_BY ({PARTITION_COLUMN}), FILENAME_PATTERN 'batch{batch}_{{i}}')"
+        ).fetchone()[0]
+        if not rows:
+            return 0, None, None
+        # Answered from the Parquet footers
+        low, high = conn.execute(f'SELECT MIN("timestamp"), MAX("timestamp") FROM {dataset_relation(target)}').fetchone()
+        return rows, low, high
+    finally:
+        conn.close()
+        shutil.rmtree(f"{target}.spill", ignore_errors=True)
+
+
+def ingest_pixel_json(sources, path, memory_limit=MEMORY_LIMIT):
+    """Rebuild the dataset at `path` from the raw JSON `sources`; returns the number of events written.
+
+    The dataset is written beside `path` and swapped in, so readers never see a partial one.
+    """
+    sources = [sources] if isinstance(sources, str) else list(sources)
+    signature = [_source_signature(source) for source in sources]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    os.makedirs(tmp_path)
+    rows, _, watermark = _copy(flatten_sql(sources), tmp_path, 0, memory_limit)
+    _write_dataset_manifest(tmp_path, {
+        'version': DATASET_VERSION, 'build': uuid.uuid4().hex, 'sources': signature,
+        'rows': rows, 'watermark': watermark, 'batches': 1,
+    })
+
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return rows
+
+
+def append_pixel_json(sources, path, memory_limit=MEMORY_LIMIT):
+    """Append the events of `sources` past the dataset watermark; returns the number of events written.
+
+    Existing files are never rewritten: the new ones are staged beside the dataset and moved into
+    their partitions, and the manifest is updated last.
+    """
+    sources = [sources] if isinstance(sources, str) else list(sources)
+    manifest = read_dataset_manifest(path)
+    if manifest is None or manifest['watermark'] is None:
+        return ingest_pixel_json(sources, path, memory_limit)
+
+    batch = manifest['batches']
+    stage_path = f"{path}.{os.getpid()}.batch"
+    shutil.rmtree(stage_path, ignore_errors=True)
+    os.makedirs(stage_path)
+    try:
+        sql = APPEND_SQL.format(flatten=flatten_sql(sources), watermark=int(manifest['watermark']),
+                                dataset=dataset_relation(path))
+        rows, _, watermark = _copy(sql, stage_path, batch, memory_limit)
+        for folder, _, files in os.walk(stage_path):
+            target = os.path.join(path, os.path.relpath(folder, stage_path))
+            os.makedirs(target, exist_ok=True)
+            for name in files:
+                os.replace(os.path.join(folder, name), os.path.join(target, name))
+    finally:
+        shutil.rmtree(stage_path, ignore_errors=True)
+
+    signature = [_source_signature(source) for source in sources]
+    manifest['sources'] = [entry for entry in manifest['sources']
+                           if entry['path'] not in {new['path'] for new in signature}] + signature
+    if rows:
+        manifest.update(rows=manifest['rows'] + rows, watermark=max(manifest['watermark'], watermark),
+                        batches=batch + 1)
+    _write_dataset_manifest(path, manifest)
+    return rows
+
+
+def refresh_pixel_attribution(db_path, path, max_workers=None):
+    """Bring db/attribution/ up to date with the dataset at `path`; returns the tables written, by name."""
+    manifest = read_dataset_manifest(path)
+    if manifest is None:
+        return {}
+    return refresh_attribution(QueryEngine(db_path), dataset_relation(path), attribution_path(path), manifest,
+                               max_workers)
+
+
+def ensure_pixel_dataset(db_path, lock_timeout=600):
+    """Path of the pixel dataset, with db/Pixel.json and the attribution tables brought up to date
+    first; None without a dataset.
+
+    A changed Pixel.json is appended from the watermark on. Concurrent workers wait on a lock
+    file, so each export is only ingested once; FetchError after `lock_timeout` seconds of waiting.
+    """
+    raw_path = raw_pixel_path(db_path)
+    path = dataset_path(db_path)
+
+    def is_stale():
+        if os.path.exists(raw_path) and not is_current(path, [raw_path]):
+            return True
+        manifest = read_dataset_manifest(path)
+        return manifest is not None and not is_refreshed(attribution_path(path), manifest)
+
+    if is_stale():
+        with file_lock(f"{path}.lock", timeout=lock_timeout):
+            if os.path.exists(raw_path) and not is_current(path, [raw_path]):
+                append_pixel_json([raw_path], path)
+            refresh_pixel_attribution(db_path, path)
+    return path if read_dataset_manifest(path) is not None else None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .paths import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Flatten raw pixel JSON exports into a Parquet dataset")
+    parser.add_argument('sources', nargs='+', help="NDJSON or JSON array files of PIXEL rows")
+    parser.add_argument('--out', default=dataset_path(DB_PATH))
+    parser.add_argument('--append', action='store_true', help="only add events past the dataset watermark")
+    parser.add_argument('--memory-limit', default=MEMORY_LIMIT)
+    parser.add_argument('--workers', type=int, help="shard a full attribution recompute by store on this many threads")
+    args = parser.parse_args()
+    with file_lock(f"{args.out}.lock"):
+        ingest = append_pixel_json if args.append else ingest_pixel_json
+        print(f"{ingest(args.sources, args.out, args.memory_limit)} events written to {args.out}")
+        tables = refresh_pixel_attribution(DB_PATH, args.out, args.workers)
+        print(f"Refreshed {', '.join(tables) or 'nothing'} in {attribution_path(args.out)}")
+        for name, df in tables.items():
+            if 'shard_timings' in df.attrs:
+                print(f"\n{name} shards:\n{df.attrs['shard_timings'].to_string(index=False, float_format='%.3f')}")
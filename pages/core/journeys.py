@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+
+class Journeys:
+    """attribution_cjm in compressed sparse row form, built once per table version.
+
+    The touchpoints of order i are `codes[offsets[i]:offsets[i + 1]]`, in step order, as small-int
+    codes into `sources`; `order_ids`, `store_codes` and `month_codes` hold one entry per order
+    instead of one per row. Step histograms, funnels and path counts are bincounts over these arrays.
+    """
+
+    def __init__(self, cjm):
+        cjm = cjm[cjm['SHOPIFYORDERID'].notna()]
+        order_codes, self.order_ids = pd.factorize(cjm['SHOPIFYORDERID'])
+        steps = pd.to_numeric(cjm['TOUCHPOINT_STEP'], errors='coerce').to_numpy(dtype=float)
+        # Missing sources keep their place in the journey under their own code
+        source_codes, sources = pd.factorize(cjm['ATTRIBUTION_SOURCE'], use_na_sentinel=False)
+        self.sources = np.asarray(sources, dtype=object)
+        code_type = np.int8 if len(self.sources) <= np.iinfo(np.int8).max else np.int16
+
+        touch_order = np.lexsort((steps, order_codes))
+        self.codes = source_codes[touch_order].astype(code_type)
+        counts = np.bincount(order_codes, minlength=len(self.order_ids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        first_rows = touch_order[self.offsets[:-1]]
+        store_codes, stores = pd.factorize(cjm['SHOPIFYSHOPURL'].to_numpy()[first_rows])
+        self.store_codes = store_codes.astype(np.int32)
+        self.stores = np.asarray(stores, dtype=object)
+        # The attribution_cjm of database.db has no MONTH; its orders get code -1 (no month)
+        months = cjm['MONTH'].to_numpy()[first_rows] if 'MONTH' in cjm else np.full(len(first_rows), None)
+        month_codes, months = pd.factorize(months)
+        self.month_codes = month_codes.astype(np.int32)
+        self.months = np.asarray(months, dtype=object)
+
+    @property
+    def n_orders(self):
+        return len(self.order_ids)
+
+    @property
+    def starts(self):
+        return self.offsets[:-1]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def positions(self):
+        """0-based step of every touchpoint within its journey."""
+        return np.arange(len(self.codes)) - np.repeat(self.starts, self.lengths)
+
+    @property
+    def nbytes(self):
+        arrays = (self.codes, self.offsets, self.store_codes, self.month_codes)
+        return sum(a.nbytes for a in arrays) + int(pd.Series(self.order_ids).memory_usage(deep=True))
+
+    def select(self, store=None, month=None):
+        """Mask of the orders of `store` placed in `month`; None matches every store or month."""
+        mask = np.ones(self.n_orders, dtype=bool)
+        for value, codes, values in ((store, self.store_codes, self.stores), (month, self.month_codes, self.months)):
+            if value is not None:
+                mask &= np.isin(codes, np.flatnonzero(values == value))
+        return mask
+
+    def _known_sources(self):
+        return [code for code, source in enumerate(self.sources) if pd.notna(source)]
+
+    def step_source_counts(self, max_step=None):
+        """Orders per (touchpoint step, source), steps numbered from 1 as TOUCHPOINT_STEP is."""
+        positions, codes = self.positions, self.codes.astype(np.intp)
+        if max_step is not None:
+            keep = positions < max_step
+            positions, codes = positions[keep], codes[keep]
+        n_sources = len(self.sources)
+        n_steps = int(positions.max()) + 1 if len(positions) else 0
+        counts = np.bincount(positions * n_sources + codes, minlength=n_steps * n_sources).reshape(n_steps, n_sources)
+        known = self._known_sources()
+        steps, sources = np.nonzero(counts[:, known])
+        return pd.DataFrame({
+            'TOUCHPOINT_STEP': steps + 1,
+            'ATTRIBUTION_SOURCE': self.sources[known][sources],
+            'ORDER_COUNT': counts[:, known][steps, sources],
+        })
+
+    def source_funnel(self, source, max_step=None):
+        """Orders with `source` at each touchpoint step."""
+        counts = self.step_source_counts(max_step)
+        counts = counts[counts['ATTRIBUTION_SOURCE'] == source]
+        return counts[['TOUCHPOINT_STEP', 'ORDER_COUNT']].reset_index(drop=True)
+
+    def path_lengths(self):
+        """Orders per number of touchpoints."""
+        counts = np.bincount(self.lengths)
+        lengths = np.flatnonzero(counts)
+        return pd.DataFrame({'PATH_LENGTH': lengths, 'ORDER_COUNT': counts[lengths]})
+
+    def path_keys(self):
+        """One row per order that is equal for two orders exactly when their paths are.
+
+        Each block of steps is packed into an int64 as digits (code + 1) in base len(sources) + 1,
+        as many steps per block as fit; journeys longer than one block take one column per block.
+        """
+        base = len(self.sources) + 1
+        chunk = 1
+        while base ** (chunk + 1) < 2 ** 63:
+            chunk += 1
+        block, digit = np.divmod(self.positions, chunk)
+        n_blocks = int(block.max()) + 1 if len(block) else 1
+        keys = np.zeros((self.n_orders, n_blocks), dtype=np.int64)
+        if len(self.codes):
+            # Touchpoints of one (order, block) cell are contiguous, so each cell is one reduceat segment
+            cell_starts = np.flatnonzero(digit == 0)
+            digits = (self.codes.astype(np.int64) + 1) * (np.int64(base) ** digit)
+            order = np.repeat(np.arange(self.n_orders), self.lengths)
+            keys[order[cell_starts], block[cell_starts]] = np.add.reduceat(digits, cell_starts)
+        return keys
+
+    def path_labels(self, order):
+        return [self.sources[code] for code in self.codes[self.offsets[order]:self.offsets[order + 1]]]
+
+
+class PathIndex:
+    """Distinct paths of a Journeys and the path of every order, built once per table version.
+
+    Paths are hashed to their exact packed keys (Journeys.path_keys) and deduplicated once; the path
+    counts of any subset of orders, e.g. one store and month, are then a single bincount over
+    `path_ids`, and the top-k paths and their transitions are read off the k winners.
+    """
+
+    def __init__(self, journeys):
+        self.journeys = journeys
+        if journeys.n_orders:
+            _, self.representatives, path_ids = np.unique(journeys.path_keys(), axis=0,
+                                                          return_index=True, return_inverse=True)
+            self.path_ids = path_ids.ravel()
+        else:
+            self.representatives = self.path_ids = np.zeros(0, dtype=np.intp)
+
+    @property
+    def n_paths(self):
+        return len(self.representatives)
+
+    def path(self, path_id):
+        return tuple(self.journeys.path_labels(self.representatives[path_id]))
+
+    def path_counts(self, orders=None):
+        """Orders per path id, among the `orders` mask or indices (all by default)."""
+        path_ids = self.path_ids if orders is None else self.path_ids[orders]
+        return np.bincount(path_ids, minlength=self.n_paths)
+
+    def top_paths(self, k=10, orders=None):
+        """The `k` most frequent paths among `orders`, with their order counts."""
+        counts = self.path_counts(orders)
+        top = np.argsort(-counts, kind='stable')[:k]
+        top = top[counts[top] > 0]
+        return pd.DataFrame({'PATH': [self.path(path_id) for path_id in top], 'ORDER_COUNT': counts[top]})
+
+    def transitions(self, k=10, orders=None, end='Purchase'):
+        """Links between consecutive touchpoints of the `k` most frequent paths, weighted by orders.
+
+        Nodes are (step, source), so a source that recurs along a path does not loop back on itself;
+        the last touchpoint of every path links to a single `end` node at step 0.
+        """
+        links = {}
+        for path, count in self.top_paths(k, orders).itertuples(index=False):
+            nodes = [(step, source) for step, source in enumerate(path, start=1)] + [(0, end)]
+            for link in zip(nodes, nodes[1:]):
+                links[link] = links.get(link, 0) + count
+        return pd.DataFrame(
+            [(*source, *target, count) for (source, target), count in links.items()],
+            columns=['SOURCE_STEP', 'SOURCE', 'TARGET_STEP', 'TARGET', 'ORDER_COUNT'],
+        )
@@ -0,0 +1,195 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .attribution_engine import (ORDER_MONTH, by_store, customer_journeys, last_touch_attribution, orders_per_month,
+                                 partitioned_by_store)
+from .files import atomic_write, read_json, write_json
+
+# The attribution tables of database.db (orders_month_store, attribution_model_<days>, attribution_cjm),
+# computed from an ingested pixel dataset into db/attribution/<table>.parquet and kept current as
+# events are appended. Every table is keyed by (store, order month), and an order only draws on
+# touchpoints at or before its own events, so events appended after a watermark can only change the
+# (store, month) groups holding an order with an event at or after it. Those groups are recomputed
+# from the events within reach of their orders; the rest of each table is kept as stored.
+
+ATTRIBUTION_FOLDER = 'attribution'
+ATTRIBUTION_MANIFEST_FILE = '_manifest.json'
+# Lookback windows of the frozen attribution_model_<days> tables
+LOOKBACK_DAYS = (90, 180)
+ORDERS_TABLE = 'orders_month_store'
+JOURNEY_TABLE = 'attribution_cjm'
+
+# (store, month) groups with order events at or after the watermark, or with an order that has one:
+# the last touch is picked per order across all of its events, so a late event can move an older order
+ORDER_ROWS = f"""
+order_rows AS (
+  SELECT
+    shopifyShopURL AS STORE,
+    {ORDER_MONTH} AS MONTH,
+    shopifyOrderId,
+    CAST("timestamp" AS BIGINT) AS timestamp
+  FROM {{events}}
+  WHERE shopifyOrderId IS NOT NULL OR shopifyPageType = 'thank_you'
+),
+affected_groups AS (
+  SELECT DISTINCT STORE, MONTH
+  FROM order_rows
+  WHERE timestamp >= $since
+     OR shopifyOrderId IN (SELECT shopifyOrderId FROM order_rows WHERE timestamp >= $since)
+),
+affected_rows AS (
+  SELECT r.*
+  FROM order_rows r
+  SEMI JOIN affected_groups g ON r.STORE = g.STORE AND r.MONTH IS NOT DISTINCT FROM g.MONTH
+)
+"""
+
+AFFECTED_GROUPS_SQL = f"""
+WITH {ORDER_ROWS}
+SELECT * FROM affected_groups
+"""
+
+AFFECTED_ORDERS_SQL = f"""
+WITH {ORDER_ROWS}
+SELECT DISTINCT shopifyOrderId AS SHOPIFYORDERID
+FROM affected_rows
+WHERE shopifyOrderId IS NOT NULL
+"""
+
+# Earliest event of the affected groups or of any of their orders, wherever it falls
+FIRST_TIMESTAMP_SQL = f"""
+WITH {ORDER_ROWS}
+SELECT MIN(timestamp) FROM (
+  SELECT timestamp FROM affected_rows
+  UNION ALL
+  SELECT timestamp FROM order_rows WHERE shopifyOrderId IN (SELECT shopifyOrderId FROM affected_rows)
+)
+"""
+
+# Rows of the stored table outside the affected groups, plus the recomputed rows inside them
+REPLACE_GROUPS_SQL = """
+SELECT * FROM stored_rows s
+WHERE NOT EXISTS (SELECT 1 FROM affected_groups g WHERE {match})
+UNION ALL BY NAME
+SELECT * FROM new_rows s
+WHERE EXISTS (SELECT 1 FROM affected_groups g WHERE {match})
+ORDER BY {order}
+"""
+
+ATTRIBUTION_ORDER = 'STORE, MONTH, ATTRIBUTED_ORDERS DESC, ATTRIBUTION_SOURCE, PAGEREFERRER, MEDIUM, CAMPAIGN'
+STORE_MONTH_MATCH = 's.STORE = g.STORE AND s.MONTH IS NOT DISTINCT FROM g.MONTH'
+
+
+def attribution_table_name(lookback_days):
+    return f"attribution_model_{lookback_days}"
+
+
+def table_names():
+    return [ORDERS_TABLE, JOURNEY_TABLE] + [attribution_table_name(days) for days in LOOKBACK_DAYS]
+
+
+def table_path(folder, table_name):
+    return os.path.join(folder, f"{table_name}.parquet")
+
+
+def read_attribution_manifest(folder):
+    return read_json(os.path.join(folder, ATTRIBUTION_MANIFEST_FILE))
+
+
+def _write_table(folder, table_name, df):
+    # Through pyarrow directly, which leaves out df.attrs (shard timings) unlike DataFrame.to_parquet
+    with atomic_write(table_path(folder, table_name)) as tmp_path:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+
+
+def _attribution_tables(attribution):
+    # Touchpoints join orders on their own timestamp (see last_touch_attribution), so every lookback
+    # window yields the same rows: the query runs once and each attribution_model_<days> gets them
+    return {attribution_table_name(days): attribution for days in LOOKBACK_DAYS}
+
+
+def compute_tables(engine, events, max_workers=None):
+    """Every table from scratch. With `max_workers`, the per-store tables are computed as one shard
+    per store on that many threads (see attribution_engine.by_store)."""
+    tables = {JOURNEY_TABLE: customer_journeys(engine, events)}
+    if not max_workers:
+        tables[ORDERS_TABLE] = orders_per_month(engine, events)
+        tables.update(_attribution_tables(last_touch_attribution(engine, events)))
+        return tables
+
+    # Journeys match touchpoints across stores (as queries.sql does), so they are not sharded
+    with partitioned_by_store(engine, events) as partitioned:
+        tables[ORDERS_TABLE] = by_store(engine, orders_per_month, partitioned, max_workers=max_workers)
+        tables.update(_attribution_tables(by_store(engine, last_touch_attribution, partitioned,
+                                                   max_workers=max_workers)))
+    return tables
+
+
+def _update_tables(engine, events, folder, since):
+    params = {'since': since}
+    groups = engine.query(AFFECTED_GROUPS_SQL.format(events=events), params)
+    if groups.empty:
+        return {}
+    orders = engine.query(AFFECTED_ORDERS_SQL.format(events=events), params)
+    first_timestamp = engine.query(FIRST_TIMESTAMP_SQL.format(events=events), params).iat[0, 0]
+    # Touchpoints only match an order at its own timestamp, so nothing before their first event counts
+    scoped = f'(SELECT * FROM {events} WHERE CAST("timestamp" AS BIGINT) >= {int(first_timestamp)})'
+
+    def replace(table_name, new_rows, affected, match, order):
+        stored_rows = pd.read_parquet(table_path(folder, table_name))
+        return engine.query(REPLACE_GROUPS_SQL.format(match=match, order=order), frames={
+            'stored_rows': stored_rows, 'new_rows': new_rows, 'affected_groups': affected,
+        })
+
+    tables = {
+        ORDERS_TABLE: replace(
+            ORDERS_TABLE, orders_per_month(engine, scoped), groups,
+            "s.STORE = g.STORE AND s.MONTH IS NOT DISTINCT FROM STRFTIME(g.MONTH, '%Y-%m-%d')", 'STORE, MONTH'),
+    }
+    attribution = last_touch_attribution(engine, scoped)
+    for days in LOOKBACK_DAYS:
+        name = attribution_table_name(days)
+        tables[name] = replace(name, attribution, groups, STORE_MONTH_MATCH, ATTRIBUTION_ORDER)
+
+    # Journeys are keyed by order rather than (store, month)
+    tables[JOURNEY_TABLE] = replace(JOURNEY_TABLE, customer_journeys(engine, scoped), orders,
+                                    's.SHOPIFYORDERID = g.SHOPIFYORDERID', 'SHOPIFYORDERID, TOUCHPOINT_STEP')
+    return tables
+
+
+def _tables_state(state):
+    return {key: state[key] for key in ('build', 'rows', 'watermark')}
+
+
+def is_refreshed(folder, state):
+    return read_attribution_manifest(folder) == _tables_state(state)
+
+
+def refresh_attribution(engine, events, folder, state, max_workers=None):
+    """Bring the tables in `folder` up to date with the events dataset described by `state`.
+
+    `state` is the dataset manifest: `build` changes on every full rebuild, `watermark` is the latest
+    event timestamp. Tables built from the same build are updated from their own watermark on;
+    anything else is recomputed in full, sharded by store with `max_workers`. Returns the tables
+    written, by name.
+    """
+    manifest = read_attribution_manifest(folder) or {}
+    current = _tables_state(state)
+    if manifest == current:
+        return {}
+    incremental = (manifest.get('build') == current['build']
+                   and all(os.path.exists(table_path(folder, name)) for name in table_names()))
+
+    os.makedirs(folder, exist_ok=True)
+    if incremental:
+        tables = _update_tables(engine, events, folder, manifest['watermark'])
+    else:
+        tables = compute_tables(engine, events, max_workers)
+    for name, df in tables.items():
+        _write_table(folder, name, df)
+    # Written last: a refresh interrupted before this point is redone from the previous watermark
+    write_json(os.path.join(folder, ATTRIBUTION_MANIFEST_FILE), current)
+    return tables
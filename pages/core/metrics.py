@@ -0,0 +1,114 @@
+import pandas as pd
+
+# The numbers behind the Outbound Sizing and Attribution pages as plain functions over the prepared
+# tables (schema.prepare_table), so batch jobs compute exactly what the pages show without a
+# Streamlit runtime. Only pandas is imported up front; `compute` imports the database readers
+# (snapshot, rollups) when it runs.
+
+# Outbound funnel stages, widest first, and the column each one sums
+FUNNEL_STAGES = {
+    'Contacts Touched': 'NB_CONTACTS_TOUCHED',
+    'Companies Touched': 'NB_COMPANIES_TOUCHED',
+    'ICP Companies Touched': 'NB_COMPANIES_TOUCHED_ICP',
+    'ICP Companies Clicked': 'NB_COMPANIES_CLICKED_ICP',
+    'ICP Companies Replied': 'NB_COMPANIES_REPLIED_ICP',
+    'ICP Positive Replies': 'NB_COMPANIES_REPLIED_POSITIVE_ICP',
+}
+# Per-campaign ICP rates, as (numerator, denominator) columns, and the average each should reach
+ICP_RATES = {
+    'ICP_CLICK_THROUGH_RATE': ('NB_COMPANIES_CLICKED_ICP', 'NB_COMPANIES_TOUCHED_ICP'),
+    'ICP_REPLY_RATE': ('NB_COMPANIES_REPLIED_ICP', 'NB_COMPANIES_TOUCHED_ICP'),
+    'ICP_POSITIVE_REPLY_RATE': ('NB_COMPANIES_REPLIED_POSITIVE_ICP', 'NB_COMPANIES_TOUCHED_ICP'),
+}
+ICP_RATE_FLOORS = {'ICP_CLICK_THROUGH_RATE': 0.2, 'ICP_REPLY_RATE': 0.1, 'ICP_POSITIVE_REPLY_RATE': 0.05}
+MIN_ICP_COMPANIES_TOUCHED = 1000
+TAM_FOCUS_COUNTRY = 'United States'
+
+
+def outbound_funnel(outbound):
+    return pd.DataFrame({'Stage': list(FUNNEL_STAGES),
+                         'Count': [outbound[col].sum() for col in FUNNEL_STAGES.values()]})
+
+
+def icp_rates(outbound):
+    """Average over campaigns of each ICP_RATES rate."""
+    return pd.Series({name: (outbound[numerator] / outbound[denominator]).mean()
+                      for name, (numerator, denominator) in ICP_RATES.items()})
+
+
+def icp_coverage(outbound):
+    touched_icp = outbound['NB_COMPANIES_TOUCHED_ICP'].sum()
+    touched = outbound['NB_COMPANIES_TOUCHED'].sum()
+    return {'ICP_COMPANIES_TOUCHED': touched_icp, 'COMPANIES_TOUCHED': touched, 'ICP_SHARE': touched_icp / touched}
+
+
+def outbound_limitations(outbound):
+    """Names of the checks outbound fails: ICP_RATES averages under their floor, and
+    ICP_COMPANIES_TOUCHED when fewer than MIN_ICP_COMPANIES_TOUCHED ICP companies were reached."""
+    rates = icp_rates(outbound)
+    failing = [name for name, floor in ICP_RATE_FLOORS.items() if rates[name] < floor]
+    if icp_coverage(outbound)['ICP_COMPANIES_TOUCHED'] < MIN_ICP_COMPANIES_TOUCHED:
+        failing.append('ICP_COMPANIES_TOUCHED')
+    return failing
+
+
+def tam_totals(tam, country=TAM_FOCUS_COUNTRY):
+    """Potential ARR of rollups.shopify_tam in total and for `country`, with its share in percent."""
+    total = tam['POLAR ARR ($)'].sum()
+    in_country = tam.loc[tam['COUNTRY'] == country, 'POLAR ARR ($)'].sum()
+    return {'POTENTIAL_ARR': total, 'COUNTRY_POTENTIAL_ARR': in_country, 'COUNTRY_SHARE': in_country / total * 100}
+
+
+def outbound_contribution(outbound, potential_arr):
+    """New ARR from outbound and its share of the potential ARR, in percent."""
+    new_arr = outbound['NEW_ARR_FROM_OB_ALL_TIME'].sum()
+    return {'NEW_ARR': new_arr, 'TAM_SHARE': new_arr / potential_arr * 100}
+
+
+def source_shares(attribution_model):
+    """Attributed orders per source with their share of all orders, in percent."""
+    order_counts = attribution_model.groupby('ATTRIBUTION_SOURCE')['ATTRIBUTED_ORDERS'].sum().reset_index()
+    order_counts['percentage'] = order_counts['ATTRIBUTED_ORDERS'] / order_counts['ATTRIBUTED_ORDERS'].sum() * 100
+    return order_counts
+
+
+def compute(db_path):
+    """Every page metric from the database at `db_path`, as JSON-ready values."""
+    import sqlite3
+
+    from .rollups import load_cube, shopify_tam
+    from .schema import prepare_table
+    from .snapshot import read_snapshot
+
+    outbound = prepare_table(read_snapshot(db_path, 'outbound'), 'outbound')
+    tam = tam_totals(shopify_tam(load_cube(db_path)))
+    metrics = {
+        'outbound_funnel': dict(outbound_funnel(outbound).itertuples(index=False)),
+        'icp_rates': icp_rates(outbound).to_dict(),
+        'icp_coverage': icp_coverage(outbound),
+        'outbound_limitations': outbound_limitations(outbound),
+        'tam': tam,
+        'outbound_contribution': outbound_contribution(outbound, tam['POTENTIAL_ARR']),
+    }
+    conn = sqlite3.connect(db_path)
+    try:
+        has_attribution = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attribution_model_90'").fetchone()
+    finally:
+        conn.close()
+    if has_attribution:
+        shares = source_shares(read_snapshot(db_path, 'attribution_model_90'))
+        metrics['attribution_source_shares'] = dict(zip(shares['ATTRIBUTION_SOURCE'], shares['percentage']))
+    return metrics
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    from .paths import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Print the Outbound Sizing and Attribution page metrics as JSON")
+    parser.add_argument('db_path', nargs='?', default=DB_PATH)
+    args = parser.parse_args()
+    print(json.dumps(compute(args.db_path), indent=2, default=float))
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Multi-touch attribution over ordered journeys (journeys.Journeys, built from attribution_cjm).
+# Every model splits one order of credit across the touchpoints of its journey; per-touchpoint
+# weights are computed for all journeys at once from each touchpoint's position and journey
+# length, and credit per source is a single weighted bincount.
+#
+# The Markov model is data-driven instead: journeys form a chain start -> sources -> conversion, and
+# each source is credited in proportion to its removal effect, the share of conversions lost when
+# every visit to it leads nowhere (the null state).
+
+MODELS = {
+    'last_touch': 'Last touch',
+    'first_touch': 'First touch',
+    'linear': 'Linear',
+    'time_decay': 'Time decay',
+    'position_based': 'U-shaped (40/20/40)',
+}
+# attribution_cjm has no touchpoint timestamps, so time decay halves a touchpoint's weight for
+# every `half_life` touchpoints between it and the order
+DEFAULT_HALF_LIFE = 2.0
+# Share of the credit the first and the last touchpoint each get in the U-shaped model
+POSITION_END_SHARE = 0.4
+
+
+def touch_weights(starts, lengths, model, half_life=DEFAULT_HALF_LIFE):
+    """Credit of every touchpoint under `model`; the weights of each journey sum to 1."""
+    length = np.repeat(lengths, lengths)
+    position = np.arange(len(length)) - np.repeat(starts, lengths)
+    from_end = length - 1 - position
+
+    if model == 'last_touch':
+        return (from_end == 0).astype(float)
+    if model == 'first_touch':
+        return (position == 0).astype(float)
+    if model == 'linear':
+        return 1.0 / length
+    if model == 'time_decay':
+        weights = 0.5 ** (from_end / half_life)
+        totals = np.add.reduceat(weights, starts) if len(starts) else weights
+        return weights / np.repeat(totals, lengths)
+    if model == 'position_based':
+        # One touchpoint gets everything, two split it evenly, longer journeys give 40% to each end
+        # and share the remaining 20% across the middle
+        ends = np.where(length == 1, 1.0, np.where(length == 2, 0.5, POSITION_END_SHARE))
+        middle = (1 - 2 * POSITION_END_SHARE) / np.maximum(length - 2, 1)
+        return np.where((position == 0) | (from_end == 0), ends, middle)
+    raise ValueError(f"Unknown attribution model {model!r}; expected one of {', '.join(MODELS)}")
+
+
+def _credit(journeys, model, half_life):
+    weights = touch_weights(journeys.starts, journeys.lengths, model, half_life)
+    return np.bincount(journeys.codes, weights=weights, minlength=len(journeys.sources))
+
+
+def credit_by_source(journeys, model, half_life=DEFAULT_HALF_LIFE):
+    """Orders credited to each source under `model`."""
+    return pd.DataFrame({'ATTRIBUTION_SOURCE': journeys.sources,
+                         'ATTRIBUTED_ORDERS': _credit(journeys, model, half_life)})
+
+
+def compare_models(journeys, half_life=DEFAULT_HALF_LIFE):
+    """Orders credited to each source, one column per model."""
+    return pd.DataFrame({label: _credit(journeys, model, half_life) for model, label in MODELS.items()},
+                        index=pd.Index(journeys.sources, name='ATTRIBUTION_SOURCE'))
+
+
+def _transition_counts(journeys, orders=None):
+    # Counts between states 0 (start), 1..n (source code + 1), n + 1 (conversion), accumulated
+    # with one bincount over (from, to) pairs; only a handful of sources, so kept dense
+    n_states = len(journeys.sources) + 2
+    touches = np.ones(len(journeys.codes), dtype=bool) if orders is None else np.repeat(orders, journeys.lengths)
+    states = journeys.codes.astype(np.intp) + 1
+    is_first = journeys.positions == 0
+    is_last = np.zeros(len(states), dtype=bool)
+    is_last[journeys.offsets[1:] - 1] = True
+    steps = touches[:-1] & ~is_last[:-1]
+    from_states = np.concatenate([np.zeros((touches & is_first).sum(), dtype=np.intp), states[:-1][steps],
+                                  states[touches & is_last]])
+    to_states = np.concatenate([states[touches & is_first], states[1:][steps],
+                                np.full((touches & is_last).sum(), n_states - 1)])
+    return np.bincount(from_states * n_states + to_states, minlength=n_states * n_states).reshape(n_states, n_states)
+
+
+def markov_removal_effects(journeys, orders=None):
+    """Orders credited to each source by the removal effects of a first-order Markov chain.
+
+    Conversion probabilities from the start state, with every source removed in turn, are absorbing
+    probabilities solved for all removals at once as one batched linear system.
+    """
+    counts = _transition_counts(journeys, orders)
+    totals = counts.sum(axis=1, keepdims=True)
+    probabilities = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    transient, conversion = probabilities[:-1, :-1], probabilities[:-1, -1]
+
+    # System 0 is the full chain, system i + 1 has source i's outgoing transitions cut to null
+    n_transient = len(transient)
+    q = np.repeat(transient[None], len(journeys.sources) + 1, axis=0)
+    r = np.repeat(conversion[None], len(journeys.sources) + 1, axis=0)
+    removed = np.arange(1, n_transient)
+    q[removed, removed, :] = 0
+    r[removed, removed] = 0
+    converted = np.linalg.solve(np.eye(n_transient) - q, r[..., None])[:, 0, 0]
+
+    effects = 1 - np.divide(converted[1:], converted[0], out=np.ones(len(removed)), where=converted[0] > 0)
+    n_orders = journeys.n_orders if orders is None else int(np.count_nonzero(orders))
+    credit = n_orders * np.divide(effects, effects.sum(), out=np.zeros(len(effects)), where=effects.sum() > 0)
+    return pd.DataFrame({'ATTRIBUTION_SOURCE': journeys.sources, 'REMOVAL_EFFECT': effects,
+                         'ATTRIBUTED_ORDERS': credit})
@@ -0,0 +1,6 @@
+import os
+
+# The repository's db/ folder: database.db and everything derived from it (snapshots, the pixel
+# dataset, the refreshed attribution tables). The app and every CLI default to it.
+DB_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'db')
+DB_PATH = os.path.join(DB_FOLDER, 'database.db')
@@ -0,0 +1,157 @@
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Opt-in profiling of a page rerun. start() begins recording for the calling thread (the session's
+# script thread); section() and @timed() then add one record per data load, transform or chart
+# with wall time, rows in and out, peak memory and, for charts, the serialized figure size. Outside
+# a recorded run they cost one context variable lookup.
+#
+# Peak memory comes from tracemalloc, which is process-wide and slows allocations down in every
+# session while on: it only runs during recorded runs. Its peak counts whatever any thread allocates
+# and resetting it affects every reader, so a section only gets a PEAK_MB when its run was the only
+# one recording from its start to its end; otherwise it is left empty.
+
+_records = contextvars.ContextVar('perf_records', default=None)
+_stack = contextvars.ContextVar('perf_stack', default=())
+_last_end = contextvars.ContextVar('perf_last_end', default=0.0)
+# Recorded runs in progress across sessions, whether tracemalloc was started for them, and how many
+# times a run started while another was in progress
+_tracers = 0
+_tracing_started = False
+_overlaps = 0
+_tracers_lock = threading.Lock()
+
+COLUMNS = ['SECTION', 'SECONDS', 'ROWS_IN', 'ROWS_OUT', 'PEAK_MB', 'FIGURE_KB', 'DEPTH']
+
+
+def is_recording():
+    return _records.get() is not None
+
+
+def start():
+    """Start recording the sections run by this thread; returns a token for stop()."""
+    global _tracers, _tracing_started, _overlaps
+    with _tracers_lock:
+        if _tracers == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        elif _tracers:
+            _overlaps += 1
+        _tracers += 1
+    started = time.perf_counter()
+    _last_end.set(started)
+    return _records.set([]), started
+
+
+def stop(token):
+    """Stop recording; returns the records of the run in order of completion."""
+    global _tracers, _tracing_started
+    reset_token, started = token
+    records = _records.get()
+    _records.reset(reset_token)
+    with _tracers_lock:
+        _tracers -= 1
+        if _tracers == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+    records.append({'SECTION': 'total', 'SECONDS': time.perf_counter() - started, 'DEPTH': 0})
+    return records
+
+
+def _rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    return None
+
+
+@contextlib.contextmanager
+def section(name, rows_in=None):
+    """Time the block as `name`; yields its record, where the block may set 'ROWS_OUT' or 'FIGURE_KB'."""
+    records = _records.get()
+    if records is None:
+        yield {}
+        return
+
+    stack = _stack.get()
+    overlaps = _overlaps
+    measured = _tracers == 1
+    if measured:
+        # A section's peak is measured from its own start; the enclosing one keeps the higher of its
+        # own peak so far and every peak measured inside it
+        if stack:
+            stack[-1]['_peak'] = max(stack[-1]['_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    record = {'SECTION': name, 'ROWS_IN': rows_in, 'DEPTH': len(stack), '_peak': 0}
+    token = _stack.set(stack + (record,))
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['SECONDS'] = time.perf_counter() - started
+        _stack.reset(token)
+        peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+        if measured and _tracers == 1 and _overlaps == overlaps:
+            record['PEAK_MB'] = (peak - base) / 2 ** 20
+            if stack:
+                stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)
+        records.append(record)
+        _last_end.set(time.perf_counter())
+
+
+def add(name, seconds, **fields):
+    """Record work timed elsewhere as a section of the current level."""
+    records = _records.get()
+    if records is not None:
+        records.append({'SECTION': name, 'SECONDS': seconds, 'DEPTH': len(_stack.get()), **fields})
+        _last_end.set(time.perf_counter())
+
+
+def since_last_section():
+    """Seconds since the last section ended (or the run started): the unsectioned work in between."""
+    return time.perf_counter() - _last_end.get()
+
+
+def timed(name=None):
+    """Decorator recording every call as a section; rows in and out are read off DataFrame
+    arguments and results."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _records.get() is None:
+                return func(*args, **kwargs)
+            rows_in = next((_rows(arg) for arg in args if _rows(arg) is not None), None)
+            # Scalar arguments tell calls apart, e.g. load_table('outbound') from load_table('market')
+            scalars = [repr(arg) for arg in [*args, *kwargs.values()] if isinstance(arg, (str, int, float))]
+            with section(f"{label}({', '.join(scalars)})", rows_in) as record:
+                result = func(*args, **kwargs)
+                record['ROWS_OUT'] = _rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def figure_kb(fig):
+    """Size of the figure as sent to the browser, which grows with the points it draws."""
+    return len(fig.to_json()) / 1024
+
+
+def to_frame(records):
+    return pd.DataFrame(records, columns=COLUMNS)
+
+
+def to_json(records, **metadata):
+    """The run as JSON: `metadata` (page, timestamp) plus one object per section."""
+    sections = json.loads(to_frame(records).to_json(orient='records'))
+    return json.dumps({**metadata, 'sections': sections}, indent=2, default=str)
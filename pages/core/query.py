@@ -0,0 +1,61 @@
+import threading
+
+from .snapshot import build_snapshot, is_fresh, snapshot_path
+
+# Shared DuckDB layer over the Parquet snapshots. Pages ask for the aggregates they chart
+# and get back small frames; filters and group-bys run inside DuckDB.
+
+# Tables that pages run through schema.clean_table, which deduplicates rows before anything is computed
+DEDUPLICATED_TABLES = {'outbound', 'market'}
+
+
+class QueryEngine:
+    def __init__(self, db_path):
+        import duckdb  # imported with the first engine rather than at startup
+
+        self.db_path = db_path
+        self._conn = duckdb.connect()
+        self._views = set()
+        self._lock = threading.Lock()
+
+    def use_table(self, table_name):
+        """Expose `table_name` as a view over its snapshot, building the snapshot if needed."""
+        with self._lock:
+            if table_name in self._views:
+                return
+            if not is_fresh(self.db_path, table_name):
+                build_snapshot(self.db_path, table_name)
+            path = snapshot_path(self.db_path, table_name).replace("'", "''")
+            select = "SELECT DISTINCT *" if table_name in DEDUPLICATED_TABLES else "SELECT *"
+            self._conn.execute(f"CREATE OR REPLACE VIEW \"{table_name}\" AS {select} FROM read_parquet('{path}')")
+            self._views.add(table_name)
+
+    def query(self, sql, params=None, tables=(), frames=None):
+        for table_name in tables:
+            self.use_table(table_name)
+        # A cursor per call keeps concurrent Streamlit sessions off each other's result sets,
+        # including any `frames` registered for this query only
+        cursor = self._conn.cursor()
+        try:
+            for name, frame in (frames or {}).items():
+                cursor.register(name, frame)
+            return cursor.execute(sql, params or []).df()
+        finally:
+            cursor.close()
+
+
+def page_referrer_contrib(engine, source='attribution_model_90'):
+    # `source` is either a table name or an attribution frame computed locally
+    if isinstance(source, str):
+        table_name, tables, frames = source, [source], None
+    else:
+        table_name, tables, frames = 'attribution_model', [], {'attribution_model': source}
+    return engine.query(f"""
+        SELECT "PAGEREFERRER",
+               SUM(TRUNC("ATTRIBUTED_ORDERS"))::BIGINT AS total_orders,
+               SUM(TRUNC("ATTRIBUTED_REVENUE"))::BIGINT AS total_revenue
+        FROM "{table_name}"
+        WHERE "PAGEREFERRER" IS NOT NULL
+        GROUP BY 1
+        ORDER BY total_orders DESC, total_revenue DESC, 1
+    """, tables=tables, frames=frames)
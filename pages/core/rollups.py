@@ -0,0 +1,129 @@
+import sqlite3
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .perf import timed
+from .schema import TABLE_SCHEMAS, apply_schema
+from .snapshot import build_snapshot, is_fresh, snapshot_path, write_snapshot
+
+# Pre-aggregated market cube: one row per (PLATFORM, GMV_CATEGORY, COUNTRY) with the sums the
+# market EDA and Outbound Sizing charts need. It is stored with the snapshots as market_cube.parquet
+# and every chart is a groupby over its few hundred rows instead of a scan of the market table.
+
+CUBE_NAME = 'market_cube'
+CUBE_KEYS = ['PLATFORM', 'GMV_CATEGORY', 'COUNTRY']
+# POLAR_ARR_POSITIVE only sums rows with POLAR ARR ($) > 0, the TAM filter of the Outbound Sizing page
+CUBE_MEASURES = ['TOTAL_GMV', 'NB_DOMAINS', 'POLAR ARR ($)', 'POLAR_ARR_POSITIVE', 'ROWS']
+
+SHOPIFY_TAM_EXCLUDED_CATEGORY = 'a) < $1M'
+
+
+def aggregate_market(df):
+    """Cube rows for a cleaned, deduplicated slice of the market table."""
+    arr = df['POLAR ARR ($)']
+    measures = pd.DataFrame({
+        'TOTAL_GMV': df['TOTAL_GMV'],
+        'NB_DOMAINS': df['NB_DOMAINS'],
+        'POLAR ARR ($)': arr,
+        'POLAR_ARR_POSITIVE': arr.where(arr > 0, 0),
+        'ROWS': 1,
+    })
+    keys = [df[key].astype(object) for key in CUBE_KEYS]
+    return measures.groupby(keys, dropna=False, sort=True).sum().reset_index()
+
+
+def merge_cubes(*cubes):
+    cube = pd.concat(cubes, ignore_index=True)
+    return cube.groupby(CUBE_KEYS, dropna=False, sort=True)[CUBE_MEASURES].sum().reset_index()
+
+
+def build_cube(db_path):
+    if not is_fresh(db_path, 'market'):
+        build_snapshot(db_path, 'market')
+    market = pq.read_table(snapshot_path(db_path, 'market'), memory_map=True).to_pandas()
+    cube = aggregate_market(market.drop_duplicates())
+    write_snapshot(db_path, CUBE_NAME, cube)
+    return cube
+
+
+def load_cube(db_path):
+    if not is_fresh(db_path, CUBE_NAME):
+        return build_cube(db_path)
+    return pq.read_table(snapshot_path(db_path, CUBE_NAME), memory_map=True).to_pandas()
+
+
+def append_market_rows(db_path, rows):
+    """Insert raw market rows into the database and fold them into the cube without rescanning the table.
+
+    Rows already present in the table are skipped, matching the deduplication the pages apply: the
+    batch is staged in a temporary table shaped like `market` and only its rows not in `market`
+    (one EXCEPT, with NULLs comparing equal) are inserted. Returns the number of rows inserted.
+    """
+    cube = load_cube(db_path)
+    columns = ", ".join(f'"{col}"' for col in rows.columns)
+    # Plain Python values with None for missing ones, as sqlite3 binds them
+    params = rows.astype(object).where(rows.notna(), None).itertuples(index=False)
+    conn = sqlite3.connect(db_path)
+    try:
+        # Staged with the column affinities of market, so values compare as they are stored there
+        conn.execute("CREATE TEMP TABLE incoming_market AS SELECT * FROM market WHERE 0")
+        conn.executemany(f"INSERT INTO incoming_market ({columns}) VALUES ({', '.join('?' * len(rows.columns))})",
+                         params)
+        conn.execute(f"CREATE TEMP TABLE new_market AS SELECT {columns} FROM incoming_market "
+                     f"EXCEPT SELECT {columns} FROM market")
+        new_rows = pd.read_sql("SELECT * FROM new_market", conn)
+        if new_rows.empty:
+            return 0
+        conn.execute(f"INSERT INTO market ({columns}) SELECT {columns} FROM new_market")
+        conn.commit()
+    finally:
+        conn.close()
+
+    new_rows = apply_schema(new_rows, TABLE_SCHEMAS['market'])
+    write_snapshot(db_path, CUBE_NAME, merge_cubes(cube, aggregate_market(new_rows)))
+    return len(new_rows)
+
+
+def slice_cube(cube, platform=None, gmv_categories=None, country=None):
+    mask = pd.Series(True, index=cube.index)
+    if platform is not None:
+        mask &= cube['PLATFORM'] == platform
+    if gmv_categories is not None:
+        mask &= cube['GMV_CATEGORY'].isin(list(gmv_categories))
+    if country is not None:
+        mask &= cube['COUNTRY'] == country
+    return cube[mask]
+
+
+@timed()
+def gmv_by_category(cube, platform=None, gmv_categories=None, country=None):
+    cells = slice_cube(cube, platform, gmv_categories, country)
+    return cells.groupby('GMV_CATEGORY')['TOTAL_GMV'].sum().astype(float)
+
+
+@timed()
+def top_by_total_gmv(cube, column, n=10, platform=None, gmv_categories=None, country=None):
+    cells = slice_cube(cube, platform, gmv_categories, country)
+    return cells.groupby(column)['TOTAL_GMV'].sum().astype(float).nlargest(n).reset_index()
+
+
+@timed()
+def shopify_tam(cube):
+    # Potential ARR per (GMV_CATEGORY, COUNTRY) for Shopify stores above the smallest GMV band
+    cells = cube[(cube['PLATFORM'] == 'Shopify') & (cube['GMV_CATEGORY'] != SHOPIFY_TAM_EXCLUDED_CATEGORY)]
+    tam = cells.groupby(['GMV_CATEGORY', 'COUNTRY'])['POLAR_ARR_POSITIVE'].sum()
+    return tam[tam > 0].rename('POLAR ARR ($)').reset_index()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .paths import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Append new market rows from a CSV export to the database and the market cube")
+    parser.add_argument('csv', help="rows with the columns of the market table")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+    # As text, which the market table's column affinities convert like the rows already stored
+    print(f"{append_market_rows(args.db, pd.read_csv(args.csv, dtype=str))} new market rows appended to {args.db}")
@@ -0,0 +1,82 @@
+import pandas as pd
+
+# Column types per table. clean_table applies them in one pass: dates are parsed, currency
+# ("$1,234") and count columns become numbers, low-cardinality text becomes categorical.
+# Columns not listed are left untouched.
+
+OUTBOUND_METRICS = [
+    'NB_EMAILS', 'NB_CONTACTS_TOUCHED', 'NB_COMPANIES_TOUCHED', 'TOTAL_NB_CLICKS',
+    'TOTAL_NB_POSITIVE_REPLIES_PER_CAMPAIGN', 'TOTAL_NB_NEGATIVE_REPLIES_PER_CAMPAIGN',
+    'NB_COMPANIES_CLICKED', 'NB_CUSTOMERS_FROM_OB_ALL_TIME', 'PIPELINE_OPP_AMOUNT_FROM_OB_ALL_TIME',
+    'NEW_ARR_FROM_OB_ALL_TIME', 'NB_COMPANIES_TOUCHED_ICP', 'NB_COMPANIES_CLICKED_ICP',
+    'NB_COMPANIES_REPLIED_ICP', 'NB_COMPANIES_REPLIED_POSITIVE_ICP',
+    'NB_COMPANIES_CLICKED_ICP.1', 'NB_COMPANIES_REPLIED_ICP.1', 'NB_COMPANIES_REPLIED_POSITIVE_ICP.1'
+]
+
+OUTBOUND_CURRENCY = ['PIPELINE_OPP_AMOUNT_FROM_OB_ALL_TIME', 'NEW_ARR_FROM_OB_ALL_TIME']
+
+TABLE_SCHEMAS = {
+    'outbound': {
+        'dates': ['CAMPAIGN_START_DATE', 'CAMPAIGN_LAST_DATE'],
+        'currency': OUTBOUND_CURRENCY,
+        'ints': [col for col in OUTBOUND_METRICS if col not in OUTBOUND_CURRENCY],
+        'categories': ['CAMPAIGN_GROUP'],
+    },
+    'market': {
+        'currency': ['TOTAL_GMV', 'AVG_GMV', 'POLAR ARR ($)'],
+        'ints': ['NB_DOMAINS'],
+        'categories': ['PLATFORM', 'GMV_CATEGORY', 'COUNTRY'],
+    },
+    'tenants': {
+        'categories': ['TENANT_ID'],
+    },
+}
+
+
+def _to_number(series):
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series.astype('string').str.replace(r'[\$,\s]', '', regex=True), errors='coerce')
+    # Whole-valued columns without gaps stay int64, as the old astype(int) cleaning produced
+    if pd.api.types.is_float_dtype(series) and series.notna().all() and (series % 1 == 0).all():
+        series = series.astype('int64')
+    return series
+
+
+def apply_schema(df, schema):
+    """Return a typed copy of `df`; the input frame is never modified."""
+    converters = {}
+    for col in schema.get('dates', []):
+        converters[col] = lambda series: pd.to_datetime(series, errors='coerce')
+    for col in schema.get('currency', []) + schema.get('ints', []):
+        converters[col] = _to_number
+    for col in schema.get('categories', []):
+        converters[col] = lambda series: series.astype('category')
+    return pd.DataFrame({
+        col: converters[col](df[col]) if col in converters else df[col]
+        for col in df.columns
+    })
+
+
+def clean_table(df, table_name):
+    schema = TABLE_SCHEMAS.get(table_name, {})
+    return apply_schema(df, schema).drop_duplicates()
+
+
+def add_campaign_length(df):
+    campaign_length = (df['CAMPAIGN_LAST_DATE'] - df['CAMPAIGN_START_DATE']).dt.days
+    df = df.drop(columns='CAMPAIGN_LENGTH', errors='ignore')
+    df.insert(df.columns.get_loc('CAMPAIGN_LAST_DATE') + 1, 'CAMPAIGN_LENGTH', campaign_length)
+    return df
+
+
+# Columns every page expects on top of the stored ones
+DERIVED_COLUMNS = {
+    'outbound': add_campaign_length,
+}
+
+
+def prepare_table(df, table_name):
+    """Cleaned frame plus derived columns, as the pages consume it."""
+    df = clean_table(df, table_name)
+    derive = DERIVED_COLUMNS.get(table_name)
+    return derive(df) if derive else df
@@ -0,0 +1,113 @@
+import os
+import re
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .files import atomic_write
+from .schema import TABLE_SCHEMAS, apply_schema
+
+# Columnar snapshots of the SQLite tables, written next to the database as db/snapshots/<table>.parquet.
+# Each file records the mtime/size of the database it was built from in its schema metadata,
+# so a changed database is detected by reading the Parquet footer only.
+
+SNAPSHOT_FOLDER = 'snapshots'
+SOURCE_MTIME_KEY = b'source_mtime_ns'
+SOURCE_SIZE_KEY = b'source_size'
+# Bump whenever coerce_types or TABLE_SCHEMAS change, so snapshots written by older code are rebuilt
+SNAPSHOT_VERSION_KEY = b'snapshot_version'
+SNAPSHOT_VERSION = b'3'
+
+# Naive dates/timestamps only: offset-qualified timestamps stay text so their calendar date is kept as written
+DATE_PATTERN = re.compile(r'^\d{4}[-/]\d{2}[-/]\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$')
+NUMBER_PATTERN = re.compile(r'^\s*-?\$?-?[\d,]*\.?\d+\s*$')
+IDENTIFIER_PATTERN = re.compile(r'id$', re.IGNORECASE)
+
+
+def snapshot_path(db_path, table_name):
+    return os.path.join(os.path.dirname(db_path), SNAPSHOT_FOLDER, f"{table_name}.parquet")
+
+
+def source_signature(db_path):
+    stat = os.stat(db_path)
+    return {
+        SOURCE_MTIME_KEY: str(stat.st_mtime_ns).encode(),
+        SOURCE_SIZE_KEY: str(stat.st_size).encode(),
+        SNAPSHOT_VERSION_KEY: SNAPSHOT_VERSION,
+    }
+
+
+def is_fresh(db_path, table_name):
+    path = snapshot_path(db_path, table_name)
+    if not os.path.exists(path):
+        return False
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return False
+    signature = source_signature(db_path)
+    return all(metadata.get(key) == value for key, value in signature.items())
+
+
+def coerce_types(df):
+    # Type text columns whose every value is a date or a ($-formatted) number; leave the rest,
+    # and identifiers such as shopifyOrderId that merely look numeric, as text
+    for col in df.columns:
+        if df[col].dtype != 'object' or IDENTIFIER_PATTERN.search(col):
+            continue
+        values = df[col].dropna()
+        if values.empty or not values.map(lambda value: isinstance(value, str)).all():
+            continue
+        if values.str.match(DATE_PATTERN).all():
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif values.str.match(NUMBER_PATTERN).all():
+            df[col] = pd.to_numeric(df[col].str.replace(r'[\$,\s]', '', regex=True), errors='coerce')
+    return df
+
+
+def write_snapshot(db_path, table_name, df, signature=None):
+    """Write `df` as the snapshot of `table_name`, stamped with the database signature it reflects."""
+    signature = signature or source_signature(db_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **signature})
+
+    path = snapshot_path(db_path, table_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_write(path) as tmp_path:
+        pq.write_table(table, tmp_path)
+    return path
+
+
+def build_snapshot(db_path, table_name):
+    # Taken before reading, so a write racing with the read leaves the snapshot stale rather than wrong
+    signature = source_signature(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn)
+    finally:
+        conn.close()
+    # Tables with a declared schema are typed by it; anything else is typed by sniffing its values
+    df = apply_schema(df, TABLE_SCHEMAS[table_name]) if table_name in TABLE_SCHEMAS else coerce_types(df)
+    return write_snapshot(db_path, table_name, df, signature)
+
+
+def read_snapshot(db_path, table_name, columns=None, where=None):
+    """Read a table from its Parquet snapshot, (re)building it first if the database changed."""
+    if not is_fresh(db_path, table_name):
+        build_snapshot(db_path, table_name)
+    path = snapshot_path(db_path, table_name)
+
+    if where:
+        select = ", ".join(f'"{col}"' for col in columns) if columns else "*"
+        import duckdb  # only filtered reads need it; keeps duckdb off the startup path
+
+        conn = duckdb.connect()
+        try:
+            return conn.execute(f"SELECT {select} FROM read_parquet(?) WHERE {where}", [path]).df()
+        finally:
+            conn.close()
+
+    table = pq.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+    return table.to_pandas()
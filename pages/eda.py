@@ -2,142 +2,167 @@
 import streamlit as st
 import sqlite3
 import os
-import requests
-import json
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-import itertools
 import numpy as np
-import re
-import duckdb
 import pyarrow as pa
-import pyarrow.parquet as pq
+from core.paths import DB_PATH
+from core.snapshot import read_snapshot
+from core.schema import OUTBOUND_METRICS, prepare_table
+from core.rollups import load_cube, gmv_by_category, top_by_total_gmv
+from core.charts import campaign_timeline_figure, scatter_figure, box_figure, bar_figure
+from core.filters import FilterIndex
+from core.perf import add as add_perf_record, figure_kb, is_recording, section, since_last_section, timed
 
 page = st.query_params.get('page', [''])[0]
 
+# Loaded tables are cached once per process and shared by every session (see shared_view); app.py turns
+# on pandas copy-on-write, so a page that adds or overwrites columns copies only what it touches,
+# never the cached frame. Every cache is keyed on the version of its source (the database or
+# attribution file mtime) and bounded with max_entries: about two versions per table, so a replaced
+# database evicts the old copies, and a small LRU for results cached per metric or store.
 
-@st.cache_data
-def load_data():
-
-
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    base_path = os.path.dirname(base_path)
-    
-    db_url = "https://raw.githubusercontent.com/Laurenyoshizuka/growth_analytics/168c1e72f0d496d164af547c5935a74ddc66e909/db/database.db"
-    
-    db_folder = os.path.join(base_path, 'db')
-    db_path = os.path.join(db_folder, 'database.db')
-    
-    if not os.path.exists(db_path):
-            st.info("Database not found locally. Downloading from GitHub...")
-            
-            # If the database doesn't exist locally, download it from GitHub
-            try:
-                os.makedirs(db_folder, exist_ok=True)
-                response = requests.get(db_url)
-                if response.status_code == 200:
-                    with open(db_path, 'wb') as db_file:
-                        db_file.write(response.content)
-                    st.success("Database downloaded successfully.")
-                else:
-                    st.error(f"Failed to download database. Status code: {response.status_code}")
-                    return {}
-            except Exception as e:
-                st.error(f"Failed to download database: {e}")
-                return {}
-
-    data_frames = {}
-    
-    db_exists = os.path.exists(db_path)
 
+DB_URL = "https://raw.githubusercontent.com/Laurenyoshizuka/growth_analytics/168c1e72f0d496d164af547c5935a74ddc66e909/db/database.db"
+# sha256 of database.db at the pinned commit, which never changes. Not recorded yet: it could not be
+# computed where this was written, so until it is, downloads are only checked to be a whole SQLite
+# database. The DB_SHA256 environment variable overrides it, e.g. for a mirror of DB_URL
+PINNED_DB_SHA256 = None
+DB_SHA256 = os.environ.get('DB_SHA256') or PINNED_DB_SHA256
+MARKET_FILTER_COLUMNS = ('PLATFORM', 'GMV_CATEGORY', 'COUNTRY')
+
+
+def duckdb_error():
+    # Only called from except clauses, which run once something raised, so duckdb is not imported
+    # at startup just to name its error
+    import duckdb
+    return duckdb.Error
+
+
+def _database_errors():
+    return sqlite3.Error, pd.errors.DatabaseError, duckdb_error(), pa.ArrowException
+
+
+def get_db_path():
+    if not os.path.exists(DB_PATH):
+        st.info("Database not found locally. Downloading from GitHub...")
+
+        # If the database doesn't exist locally, download it from GitHub. Concurrent sessions wait
+        # on the same lock, so only the first one actually downloads
+        from core.fetch import FetchError, fetch_file, is_sqlite_database
+        try:
+            fetch_file(DB_URL, DB_PATH, sha256=DB_SHA256, validate=is_sqlite_database)
+            st.success("Database downloaded successfully.")
+        except (FetchError, OSError) as e:
+            st.error(f"Failed to download database: {e}")
+            return None
+    return DB_PATH
+
+
+def shared_view(df):
+    # Zero-copy view of a cached frame; writes through it copy the affected columns first
+    return df.copy(deep=False)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _read_table(db_path, db_mtime, table_name, columns=None, where=None):
+    # db_mtime is only part of the cache key, so each table is re-read once the file changes
+    return read_snapshot(db_path, table_name, columns=columns, where=where)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _table_names(db_path, db_mtime):
+    conn = sqlite3.connect(db_path)
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        existing_tables = [table[0] for table in cursor.fetchall()]
-        
-        for table_name in existing_tables:
-            df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-            data_frames[table_name] = df
-            if 'eda.py' in locals():
-                st.info(f"Loaded existing table '{table_name}' from database.")
-        
-        # try:
-        #     ddb_conn = duckdb.connect(duckdb_path)
-            
-        #     # Process JSON files
-        #     json_files = [f for f in os.listdir(data_folder) if f.endswith('.json')]
-            
-        #     # Special handling for Pixel.json
-        #     pixel_file = os.path.join(data_folder, "Pixel.json")
-        #     if os.path.exists(pixel_file):
-        #         st.header("Processing Pixel Data")
-                
-        #         # First analyze the format
-        #         analysis = analyze_pixel_data(pixel_file)
-                
-        #         # Then process with the robust parser
-        #         df_pixel = process_pixel_json_robust(pixel_file, "Pixel", ddb_conn, data_folder)
-        #         if df_pixel is not None:
-        #             data_frames["Pixel"] = df_pixel
-                
-        #         # Remove Pixel.json from the list of files to process
-        #         json_files = [f for f in json_files if f.lower() != "pixel.json"]
-            
-        #     # Process remaining JSON files
-        #     for file_name in json_files:
-        #         file_path = os.path.join(data_folder, file_name)
-                
-        #         if not os.path.exists(file_path):
-        #             st.error(f"File not found: {file_path}")
-        #             continue
-
-        #         if os.path.getsize(file_path) == 0:
-        #             st.error(f"Error: {file_name} is empty!")
-        #             continue
-                
-        #         table_name = os.path.splitext(file_name)[0]
-                
-        #         # Continue with your standard JSON processing for other files
-        #         # [Original JSON processing code would go here]
-        #         # ...
-            
-        #     # Close DuckDB connection
-        #     ddb_conn.close()
-            
-        # except Exception as e:
-        #     st.error(f"DuckDB error: {str(e)}")
-        #     import traceback
-        #     st.error(traceback.format_exc())
-        
-        conn.commit()
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        return tuple(table[0] for table in cursor.fetchall())
+    finally:
         conn.close()
 
-    except sqlite3.OperationalError as e:
+
+def list_tables():
+    db_path = get_db_path()
+    if db_path is None:
+        return []
+    return list(_table_names(db_path, os.path.getmtime(db_path)))
+
+
+@timed()
+def load_table(table_name, columns=None, where=None):
+    """Load a single table, optionally restricted to `columns` and a SQL `where` clause."""
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    try:
+        return shared_view(_read_table(db_path, os.path.getmtime(db_path), table_name,
+                                   tuple(columns) if columns else None, where))
+    except _database_errors() as e:
+        st.error(f"Error while accessing the database: {e}")
+        return pd.DataFrame()
+
+
+@st.cache_resource(show_spinner=False, max_entries=6)
+def prepared_table(db_path, db_mtime, table_name):
+    return prepare_table(_read_table(db_path, db_mtime, table_name), table_name)
+
+
+@timed()
+def load_prepared(table_name):
+    """Cleaned table with derived columns, computed once per database version for every page."""
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    try:
+        return shared_view(prepared_table(db_path, os.path.getmtime(db_path), table_name))
+    except _database_errors() as e:
         st.error(f"Error while accessing the database: {e}")
+        return pd.DataFrame()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _filter_index(db_path, db_mtime, table_name, columns):
+    # Positions refer to the row order of the prepared table, which every copy of it shares
+    return FilterIndex(prepared_table(db_path, db_mtime, table_name), columns)
+
+
+def load_filter_index(table_name, columns):
+    db_path = get_db_path()
+    if db_path is None:
+        return FilterIndex(pd.DataFrame(columns=list(columns)), columns)
+    return _filter_index(db_path, os.path.getmtime(db_path), table_name, tuple(columns))
+
 
-    return data_frames
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _market_cube(db_path, db_mtime):
+    return load_cube(db_path)
 
-def clean_df(df):
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            if col == 'CAMPAIGN_GROUP':
-                continue
-            if df[col].str.contains(r'\d{4}[-/]\d{2}[-/]\d{2}', regex=True).any():
-                df[col] = pd.to_datetime(df[col], errors='coerce').dt.date
-                continue
-            if col in ['PLATFORM', 'GMV_CATEGORY', 'COUNTRY']:
-                continue
-            df[col] = df[col].replace({'[\$,]': ''}, regex=True).astype(int)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        df = df.drop_duplicates()
-    return df
+
+@timed()
+def load_market_cube():
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    return _market_cube(db_path, os.path.getmtime(db_path))
+
+
+def plotly_chart(fig, *args, **kwargs):
+    """st.plotly_chart; when profiling, the figure build (everything since the previous section) and
+    the render are recorded, with the size of the serialized figure."""
+    if not is_recording():
+        return st.plotly_chart(fig, *args, **kwargs)
+    name = fig.layout.title.text or (fig.data[0].type if fig.data else 'figure')
+    points = sum(next((len(values) for values in (getattr(trace, attr, None) for attr in ('x', 'y', 'values', 'labels'))
+                       if values is not None), 0) for trace in fig.data)
+    add_perf_record(f"figure {name}", since_last_section(), ROWS_OUT=points)
+    with section(f"render {name}", rows_in=points) as record:
+        record['FIGURE_KB'] = figure_kb(fig)
+        return st.plotly_chart(fig, *args, **kwargs)
 
 
 def run_eda():
     st.title('Exploratory Data Analysis (EDA)')
+    if get_db_path() is None:
+        return  # get_db_path has shown why the database is unavailable
     with st.expander("✨ Overview"):
         st.write("""
         This app is divided into 3 pages:
@@ -146,7 +171,6 @@ def run_eda():
         3. **Attribution Model**
         """)
 
-    data_frames = load_data()
     dataset_map = {'outbound': 'Outbound Campaigns', 
                    'market': 'Market Data', 
                    'tenants': 'Tenants',
@@ -161,31 +185,13 @@ def run_eda():
     # Outbound Data EDA #
     #####################
     if selected_key == 'outbound':
-        outbound_data = data_frames['outbound']
-        outbound_data = clean_df(outbound_data)
+        outbound_data = load_prepared('outbound')
 
-        # Adding campgin length col
-        campaign_length = (pd.to_datetime(outbound_data['CAMPAIGN_LAST_DATE'], errors='coerce') - 
-                        pd.to_datetime(outbound_data['CAMPAIGN_START_DATE'], errors='coerce')).dt.days
-        last_date_index = outbound_data.columns.get_loc('CAMPAIGN_LAST_DATE')
-
-        if 'CAMPAIGN_LENGTH' in outbound_data.columns:
-            outbound_data.drop('CAMPAIGN_LENGTH', axis=1, inplace=True)
-
-        outbound_data.insert(last_date_index + 1, 'CAMPAIGN_LENGTH', campaign_length)
-  
         st.sidebar.markdown('---')
 
         st.header('Outbound Campaign Data')
 
-        metric_columns = [
-            'NB_EMAILS', 'NB_CONTACTS_TOUCHED', 'NB_COMPANIES_TOUCHED', 'TOTAL_NB_CLICKS',
-            'TOTAL_NB_POSITIVE_REPLIES_PER_CAMPAIGN', 'TOTAL_NB_NEGATIVE_REPLIES_PER_CAMPAIGN',
-            'NB_COMPANIES_CLICKED', 'NB_CUSTOMERS_FROM_OB_ALL_TIME', 'PIPELINE_OPP_AMOUNT_FROM_OB_ALL_TIME',
-            'NEW_ARR_FROM_OB_ALL_TIME', 'NB_COMPANIES_TOUCHED_ICP', 'NB_COMPANIES_CLICKED_ICP',
-            'NB_COMPANIES_REPLIED_ICP', 'NB_COMPANIES_REPLIED_POSITIVE_ICP',
-            'NB_COMPANIES_CLICKED_ICP.1', 'NB_COMPANIES_REPLIED_ICP.1', 'NB_COMPANIES_REPLIED_POSITIVE_ICP.1'
-        ]
+        metric_columns = OUTBOUND_METRICS
 
         campaign_groups = sorted(outbound_data['CAMPAIGN_GROUP'].unique())
         st.sidebar.subheader('Filter Outbound Campaigns')
@@ -194,18 +200,17 @@ def run_eda():
         st.sidebar.subheader('Select Metric to Visualize')
         selected_metric = st.sidebar.selectbox('Select Metric', metric_columns, help='Select a metric to visualize')
 
-        query = ""
         if selected_campaign_group != 'All':
-            query += f"CAMPAIGN_GROUP == '{selected_campaign_group}'"
-
-        filtered_outbound_data = outbound_data.query(query) if query else outbound_data
+            filtered_outbound_data = outbound_data[outbound_data['CAMPAIGN_GROUP'] == selected_campaign_group]
+        else:
+            filtered_outbound_data = outbound_data
         filtered_outbound_data = filtered_outbound_data.iloc[:, :-3]
 
         st.dataframe(filtered_outbound_data, hide_index=True)
 
         # Descriptive Statistics
         st.subheader('Descriptive Statistics')
-        st.write(filtered_outbound_data.describe())
+        st.write(filtered_outbound_data.describe(include=[np.number]))
 
         # Summary of unique values
         unique_values = filtered_outbound_data.nunique().reset_index()
@@ -220,14 +225,14 @@ def run_eda():
         # Visualizations by Campaign Group
         st.subheader(f'Campaign Performance by {selected_metric}')
         outbound_data = outbound_data.sort_values(by=[selected_metric], ascending=False)
-        fig = px.bar(
+        fig = bar_figure(
             outbound_data,
             x='CAMPAIGN_GROUP',
             y=selected_metric,
             title=f'{selected_metric} per Campaign',
             labels={'{selected_metric}': 'Total Clicks', 'CAMPAIGN_GROUP': 'Campaign'},
         )
-        st.plotly_chart(fig, use_container_width=True) 
+        plotly_chart(fig, use_container_width=True) 
 
         # Visualizations of Outbound Data over Time
         outbound_data['CAMPAIGN_START_DATE'] = pd.to_datetime(outbound_data['CAMPAIGN_START_DATE'], errors='coerce').dt.date
@@ -236,41 +241,10 @@ def run_eda():
         if selected_metric in outbound_data.columns:
             filtered_data = outbound_data.dropna(subset=['CAMPAIGN_START_DATE', 'CAMPAIGN_LAST_DATE', selected_metric, 'CAMPAIGN_GROUP'])
 
-            fig = go.Figure()
-            color_cycle = itertools.cycle(px.colors.qualitative.Set3 + px.colors.qualitative.Dark24)
-            campaign_colors = {group: next(color_cycle) for group in filtered_data['CAMPAIGN_GROUP'].unique()}
-            line_styles = itertools.cycle(["solid", "dot", "dash", "longdash", "dashdot"])
-
-            for campaign_group, group_data in filtered_data.groupby('CAMPAIGN_GROUP'):
-                campaign_data = group_data[['CAMPAIGN_START_DATE', 'CAMPAIGN_LAST_DATE', selected_metric]]
-                for _, row in group_data.iterrows():
-                    fig.add_trace(go.Scatter(
-                        x=[row['CAMPAIGN_START_DATE'], row['CAMPAIGN_LAST_DATE']],
-                        y=[row[selected_metric], row[selected_metric]],
-                        mode='lines+markers',
-                        name=campaign_group,
-                        line=dict(color=campaign_colors[campaign_group], dash=next(line_styles)),
-                        hoverinfo="text",
-                        hovertext=campaign_data.apply(lambda row: f"Start: {row['CAMPAIGN_START_DATE']}<br>End: {row['CAMPAIGN_LAST_DATE']}<br>{selected_metric}: {row[selected_metric]}", axis=1)
-                    ))
-            fig.update_layout(
-                title=f"{selected_metric} Over Time by Campaign Group",
-                xaxis_title="Campaign Date Range",
-                yaxis_title=selected_metric,
-                xaxis=dict(
-                    tickangle=-45,
-                    rangeslider=dict(
-                        visible=True,
-                        thickness=0.05,
-                    ),
-                    type='date',
-                ),
-                hovermode="x unified",
-                height=800 
-            )
-            st.plotly_chart(fig, use_container_width=True) 
-
-        fig = px.scatter(
+            fig = campaign_timeline_figure(filtered_data, selected_metric)
+            plotly_chart(fig, use_container_width=True) 
+
+        fig = scatter_figure(
             outbound_data,
             x='CAMPAIGN_LENGTH',
             y=selected_metric,
@@ -283,21 +257,22 @@ def run_eda():
             },
             hover_data=['CAMPAIGN_START_DATE', 'CAMPAIGN_LAST_DATE']
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
         if 'CAMPAIGN_START_DATE' in outbound_data.columns:
             outbound_data['CAMPAIGN_START_DATE'] = pd.to_datetime(outbound_data['CAMPAIGN_START_DATE'], errors='coerce')
-            campaigns_by_start = outbound_data.groupby(outbound_data['CAMPAIGN_START_DATE'].dt.month)[selected_metric].sum().reset_index()
+            with section('groupby start month', rows_in=len(outbound_data)) as record:
+                campaigns_by_start = outbound_data.groupby(outbound_data['CAMPAIGN_START_DATE'].dt.month)[selected_metric].sum().reset_index()
+                record['ROWS_OUT'] = len(campaigns_by_start)
             fig = px.bar(campaigns_by_start, x='CAMPAIGN_START_DATE', y=selected_metric, title=f'Campaigns by Start Month ({selected_metric})')
-            st.plotly_chart(fig, use_container_width=True) 
+            plotly_chart(fig, use_container_width=True) 
 
 
     ######################
     # Marketing Data EDA #
     ######################
     elif selected_key == 'market':
-        market_data = data_frames.get('market')
-        market_data = clean_df(market_data)
+        market_data = load_prepared('market')
 
         if market_data is None or market_data.empty:
             st.error("Market data is missing or empty. Please check your data source.")
@@ -315,23 +290,24 @@ def run_eda():
         selected_gmv_category = st.sidebar.multiselect('Select GMV Categories',list(gmv_categories), default=list(gmv_categories))
         selected_country = st.sidebar.selectbox('Select Country', ['All'] + list(countries))
 
-        query = []
-        if selected_platform != 'All':
-            query.append(f"PLATFORM == '{selected_platform}'")
-        if selected_gmv_category != 'All':
-            query.append(f"GMV_CATEGORY in {selected_gmv_category}")
-        if selected_country != 'All':
-            query.append(f"COUNTRY == '{selected_country}'")
-
-        query_string = " & ".join(query)
-        
-
-        filtered_market_data = market_data.query(query_string) if query_string else market_data
+        market_filters = dict(
+            platform=selected_platform if selected_platform != 'All' else None,
+            gmv_categories=selected_gmv_category,
+            country=selected_country if selected_country != 'All' else None,
+        )
+        market_cube = load_market_cube()
+
+        market_index = load_filter_index('market', MARKET_FILTER_COLUMNS)
+        filtered_market_data = market_data.iloc[market_index.select(
+            PLATFORM=market_filters['platform'],
+            GMV_CATEGORY=market_filters['gmv_categories'],
+            COUNTRY=market_filters['country'],
+        )]
         st.write(filtered_market_data)
 
         # Descriptive Statistics
         st.subheader('Descriptive Statistics')
-        st.write(filtered_market_data.describe())
+        st.write(filtered_market_data.describe(include=[np.number]))
 
         # Summary of unique values
         unique_values = filtered_market_data.nunique().reset_index()
@@ -345,52 +321,40 @@ def run_eda():
 
         # Total GMV per GMV Category
         st.markdown("###### Total GMV per GMV Category")
-        filtered_market_data['TOTAL_GMV'] = filtered_market_data['TOTAL_GMV'].replace('[\$,]', '', regex=True).astype(float)
-        st.bar_chart(filtered_market_data.groupby('GMV_CATEGORY')['TOTAL_GMV'].sum())
+        st.bar_chart(gmv_by_category(market_cube, **market_filters))
 
         # AVG_GMV by GMV_CATEGORY
         log_transform = st.checkbox("Apply Log Transformation to AVG_GMV for Boxplots", value=False)
-        filtered_market_data['AVG_GMV'] = filtered_market_data['AVG_GMV'].replace('[\$,]', '', regex=True).astype(float)
+        box_data = filtered_market_data[['GMV_CATEGORY']].assign(AVG_GMV=filtered_market_data['AVG_GMV'].astype(float))
         if log_transform:
-            filtered_market_data['AVG_GMV'] = filtered_market_data['AVG_GMV'].apply(lambda x: np.log1p(x) if x > 0 else None)
+            box_data['AVG_GMV'] = np.log1p(box_data['AVG_GMV'].where(box_data['AVG_GMV'] > 0))
             y_axis_title = "Log(1 + AVG_GMV)"
             title = "AVG_GMV by GMV_CATEGORY (Log Transformed)"
         else:
             y_axis_title = "AVG_GMV"
             title = "AVG_GMV by GMV_CATEGORY"
-        fig = px.box(
-            filtered_market_data, 
+        fig = box_figure(
+            box_data, 
             x='GMV_CATEGORY', 
             y='AVG_GMV', 
             title=title,
             labels={'AVG_GMV': y_axis_title}
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
         # NB_DOMAINS vs TOTAL_GMV by GMV_CATEGORY
-        filtered_market_data['NB_DOMAINS'] = pd.to_numeric(filtered_market_data['NB_DOMAINS'], errors='coerce')
-        fig = px.scatter(filtered_market_data, x='NB_DOMAINS', y='TOTAL_GMV',
+        fig = scatter_figure(filtered_market_data, x='NB_DOMAINS', y='TOTAL_GMV',
                         color='GMV_CATEGORY',
                         title='NB_DOMAINS vs TOTAL_GMV by GMV_CATEGORY',
                         labels={'NB_DOMAINS': 'Number of Domains', 'TOTAL_GMV': 'Total GMV'})
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
         # Top Platforms by Total GMV
-        top_platforms = filtered_market_data.groupby('PLATFORM')['TOTAL_GMV'].sum().nlargest(10).reset_index()
+        top_platforms = top_by_total_gmv(market_cube, 'PLATFORM', n=10, **market_filters)
         fig = px.bar(top_platforms, x='PLATFORM', y='TOTAL_GMV', title='Top 10 Platforms by Total GMV')
-        st.plotly_chart(fig, use_container_width=True)
-
-        if selected_platform != 'All':
-            platform_filtered_data = filtered_market_data[filtered_market_data['PLATFORM'] == selected_platform]
-        else:
-            platform_filtered_data = filtered_market_data
+        plotly_chart(fig, use_container_width=True)
 
-        top_countries = (
-            platform_filtered_data.groupby('COUNTRY')['TOTAL_GMV']
-            .sum()
-            .nlargest(10)
-            .reset_index()
-        )
+        top_countries = top_by_total_gmv(market_cube, 'COUNTRY', n=10, **market_filters)
 
         # Top Countries by Total GMV
         fig = px.bar(
@@ -400,14 +364,14 @@ def run_eda():
             title=f'Top 10 Countries by Total GMV ({selected_platform})' if selected_platform != 'All' else 'Top 10 Countries by Total GMV',
             labels={'TOTAL_GMV': 'Total GMV ($)', 'COUNTRY': 'Country'}
         )
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
 
    #####################
     # Tenants Data EDA #
     ####################
     elif selected_key == 'tenants':
-        tenants_data = data_frames.get('tenants')
+        tenants_data = load_prepared('tenants')
         
         if tenants_data is None or tenants_data.empty:
             st.error("Tenants data is missing or empty. Please check your data source.")
@@ -425,24 +389,29 @@ def run_eda():
         st.dataframe(unique_values, use_container_width=True)
 
         # Unique stores per Tenant
-        unique_stores = tenants_data.groupby('TENANT_ID')['DATASOURCE_ID'].nunique().reset_index()
+        with section('groupby tenant stores', rows_in=len(tenants_data)) as record:
+            unique_stores = tenants_data.groupby('TENANT_ID', observed=True)['DATASOURCE_ID'].nunique().reset_index()
+            record['ROWS_OUT'] = len(unique_stores)
         unique_stores = unique_stores.sort_values(by='DATASOURCE_ID', ascending=False)
         top_10_unique_stores = unique_stores.head(10)
         fig = px.bar(top_10_unique_stores, x='TENANT_ID', y='DATASOURCE_ID', 
              labels={'TENANT_ID': 'Tenant ID', 'DATASOURCE_ID': 'Number of Unique Stores'},
              title='Top 10 Tenants by Number of Stores',
              color='DATASOURCE_ID', color_continuous_scale='Viridis')
-        st.plotly_chart(fig)
+        plotly_chart(fig)
 
         
     ##################
     # PIxel Data EDA #
     ##################
     elif selected_key == 'pixel':
-        orders_per_month_per_store = data_frames.get('orders_month_store')
-        attribution_model_90 = data_frames.get('attribution_model_90')
-        attribution_model_180 = data_frames.get('attribution_model_180')
-        attribution_cjm = data_frames.get('attribution_cjm')
+        # The pixel tables come with the Attribution page's loaders, which the other views don't need
+        from attribution import load_attribution_table
+
+        orders_per_month_per_store = load_attribution_table('orders_month_store')
+        attribution_model_90 = load_attribution_table('attribution_model_90')
+        attribution_model_180 = load_attribution_table('attribution_model_180')
+        attribution_cjm = load_attribution_table('attribution_cjm')
 
         st.write("Orders per Month per Store:")
         st.dataframe(orders_per_month_per_store,  use_container_width=True, hide_index=True)
@@ -452,6 +421,4 @@ def run_eda():
         st.write('180-day window')
         st.dataframe(attribution_model_180, use_container_width=True, hide_index=True)
         st.write('Multi-touch Customer Journey Dataset')
-        st.dataframe(attribution_cjm, use_container_width=True, hide_index=True)
-
-    return data_frames
\ No newline at end of file
+        st.dataframe(attribution_cjm, use_container_width=True, hide_index=True)
\ No newline at end of file
@@ -1,15 +1,61 @@
+import os
 import streamlit as st
-from eda import * 
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
+import plotly.express as px
+from eda import get_db_path, load_prepared, load_market_cube, plotly_chart, prepared_table, shared_view
+from core.schema import OUTBOUND_METRICS
+from core.rollups import shopify_tam
+from core.perf import timed
+from core.concentration import pareto, lorenz_curve, concentration_summary, top_labels, DEFAULT_SHARE, TOP_LABEL
+from core.metrics import (outbound_funnel, icp_rates, icp_coverage, outbound_limitations, tam_totals,
+                          outbound_contribution)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _pareto(db_path, db_mtime, metric, by):
+    return pareto(prepared_table(db_path, db_mtime, 'outbound'), metric, by)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _lorenz_curve(db_path, db_mtime, metric, by):
+    return lorenz_curve(prepared_table(db_path, db_mtime, 'outbound'), metric, by)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _concentration_summary(db_path, db_mtime, by):
+    return concentration_summary(prepared_table(db_path, db_mtime, 'outbound'), OUTBOUND_METRICS, by)
+
+
+@timed()
+def load_pareto(metric, by=None):
+    """Outbound campaigns (or their `by` groups) ranked by `metric`, cached per metric and grouping."""
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    return shared_view(_pareto(db_path, os.path.getmtime(db_path), metric, by))
+
+
+@timed()
+def load_lorenz_curve(metric, by=None):
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    return shared_view(_lorenz_curve(db_path, os.path.getmtime(db_path), metric, by))
+
+
+@timed()
+def load_concentration_summary(by=None):
+    """Gini and top-share thresholds of every outbound metric."""
+    db_path = get_db_path()
+    if db_path is None:
+        return pd.DataFrame()
+    return shared_view(_concentration_summary(db_path, os.path.getmtime(db_path), by))
+
 
 def run_outbound_sizing():
-    data_frames = load_data()
-    outbound_data = data_frames.get('outbound')
-    outbound_data = clean_df(outbound_data)
-    market_data = data_frames.get('market')
-    market_data = clean_df(market_data)
+    if get_db_path() is None:
+        return  # get_db_path has shown why the database is unavailable
+    outbound_data = load_prepared('outbound')
 
     st.title("Outbound Sizing Analysis")
     with st.expander("✨ Overview"):
@@ -22,37 +68,47 @@ def run_outbound_sizing():
 
     st.subheader("NEW_ARR_FROM_OB_ALL_TIME as a Metric to Assess Campaign Efficacy")
 
-    # Outbound effectiveness
-    outbound_data_sorted = outbound_data.sort_values(by=['NEW_ARR_FROM_OB_ALL_TIME'], ascending=False)
-    outbound_data_sorted['CUMULATIVE_NEW_ARR'] = outbound_data_sorted['NEW_ARR_FROM_OB_ALL_TIME'].cumsum()
-    total_new_arr = outbound_data_sorted['NEW_ARR_FROM_OB_ALL_TIME'].sum()
-    threshold = 0.8 * total_new_arr
-    outbound_data_sorted['COLOR_LABEL'] = outbound_data_sorted['CUMULATIVE_NEW_ARR'].apply(
-        lambda x: 'Top 80%' if x <= threshold else 'Other'
-    )
-    num_campaigns_top_80 = (outbound_data_sorted['CUMULATIVE_NEW_ARR'] <= threshold).sum()
-    percentage_top_80 = (num_campaigns_top_80 / len(outbound_data_sorted)) * 100
+    # Outbound effectiveness: how concentrated a metric is across campaigns
+    col1, col2, col3 = st.columns(3)
+    pareto_metric = col1.selectbox('Pareto Metric', OUTBOUND_METRICS, index=OUTBOUND_METRICS.index('NEW_ARR_FROM_OB_ALL_TIME'))
+    pareto_by = col2.radio('Rank', ['Campaigns', 'Campaign Groups'], horizontal=True)
+    pareto_share = col3.slider('Share of Total', min_value=0.5, max_value=0.95, value=DEFAULT_SHARE, step=0.05)
+    metric_label = 'New ARR' if pareto_metric == 'NEW_ARR_FROM_OB_ALL_TIME' else pareto_metric
+
+    outbound_data_sorted = load_pareto(pareto_metric, None if pareto_by == 'Campaigns' else 'CAMPAIGN_GROUP')
+    outbound_data_sorted['COLOR_LABEL'] = top_labels(outbound_data_sorted, pareto_share)
+    top_label = TOP_LABEL.format(share=pareto_share)
+    percentage_top = (outbound_data_sorted['COLOR_LABEL'] == top_label).mean() * 100
 
     fig1 = px.bar(outbound_data_sorted, 
                   x='CAMPAIGN_GROUP', 
-                  y='NEW_ARR_FROM_OB_ALL_TIME', 
-                  title=f"{percentage_top_80:.0f}% of Campaigns Account for 80% of Total New ARR",
+                  y=pareto_metric, 
+                  title=f"{percentage_top:.0f}% of {pareto_by} Account for {pareto_share:.0%} of Total {metric_label}",
                   labels={'NEW_ARR_FROM_OB_ALL_TIME': 'New ARR ($)', 'CAMPAIGN_GROUP': 'Campaign'},
                   color='COLOR_LABEL', 
-                  color_discrete_map={'Top 80%': 'blue', 'Other': 'lightgray'})
-    st.plotly_chart(fig1, use_container_width=True)
+                  color_discrete_map={top_label: 'blue', 'Other': 'lightgray'})
+    plotly_chart(fig1, use_container_width=True)
     st.markdown("""
                 - **The top 6 campaigns include: :blue[GA4, GPT V3-CAPI, Loom, Klaviyo flows enrich, Ask Polar Lite, and GPT V4 (GPT-4o)].**
                 - Using a proxy for the CAC : CLV ratio, the North Star metric for outbound campaign efficacy is NEW_ARR_FROM_OB_ALL_TIME, 
                 since it shows the actual revenue impact of outbound campaigns.
     """)
+    with st.expander("Concentration of every metric"):
+        lorenz = load_lorenz_curve(pareto_metric, None if pareto_by == 'Campaigns' else 'CAMPAIGN_GROUP')
+        summary = load_concentration_summary(None if pareto_by == 'Campaigns' else 'CAMPAIGN_GROUP')
+        gini = summary.loc[summary['METRIC'] == pareto_metric, 'GINI'].iloc[0]
+        fig_lorenz = px.line(lorenz, x='POPULATION_SHARE', y='VALUE_SHARE',
+                             title=f"Lorenz Curve of {metric_label} (Gini {gini:.2f})",
+                             labels={'POPULATION_SHARE': f'Share of {pareto_by}', 'VALUE_SHARE': f'Share of {metric_label}'})
+        fig_lorenz.add_scatter(x=[0, 1], y=[0, 1], mode='lines', name='Equality', line=dict(dash='dash', color='lightgray'))
+        plotly_chart(fig_lorenz, use_container_width=True)
+        st.write(f"Gini coefficient and share of {pareto_by.lower()} holding each share of the total, per metric:")
+        st.dataframe(summary.round(3), use_container_width=True, hide_index=True)
     st.divider()
 
     # Outbound opportunity size
     st.subheader("The United States is key in generating New ARR from scaling to the TAM")
-    shopify_data = market_data[(market_data['PLATFORM'] == 'Shopify') 
-                               & (market_data['GMV_CATEGORY'] != 'a) < $1M')
-                               & (market_data['POLAR ARR ($)'] > 0)]
+    shopify_data = shopify_tam(load_market_cube())
     fig2 = px.treemap(shopify_data, 
                              path=['GMV_CATEGORY', 'COUNTRY'], 
                              values='POLAR ARR ($)', 
@@ -61,10 +117,10 @@ def run_outbound_sizing():
                              color='POLAR ARR ($)',
                              color_continuous_scale='blues')
     fig2.update_layout(height=600)
-    st.plotly_chart(fig2, use_container_width=True)
-    Potential_ARR = shopify_data['POLAR ARR ($)'].sum()
-    US_Potential_ARR = shopify_data[shopify_data['COUNTRY'] == 'United States']['POLAR ARR ($)'].sum()
-    US_Potential_ARR_Percent = (US_Potential_ARR / Potential_ARR) * 100
+    plotly_chart(fig2, use_container_width=True)
+    tam = tam_totals(shopify_data, 'United States')
+    Potential_ARR = tam['POTENTIAL_ARR']
+    US_Potential_ARR_Percent = tam['COUNTRY_SHARE']
     st.markdown(f"""
                 - The total potential ARR from scaling to the Total Addressable Market (TAM) is **${Potential_ARR:,.0f}**.
                 - The treemap shows how potential new ARR ($) from scaling to the TAM is distributed across different countries,
@@ -75,59 +131,28 @@ def run_outbound_sizing():
 
     # Prioritize outbound as a growth lever
     st.subheader("Acquisition Mix Evaluation: Outbound as a Growth Lever")
-    funnel_data = pd.DataFrame({
-        'Stage': [
-            'Contacts Touched', 
-            'Companies Touched', 
-            'ICP Companies Touched', 
-            'ICP Companies Clicked', 
-            'ICP Companies Replied', 
-            'ICP Positive Replies'
-        ],
-        'Count': [
-            outbound_data['NB_CONTACTS_TOUCHED'].sum(),
-            outbound_data['NB_COMPANIES_TOUCHED'].sum(),
-            outbound_data['NB_COMPANIES_TOUCHED_ICP'].sum(),
-            outbound_data['NB_COMPANIES_CLICKED_ICP'].sum(),
-            outbound_data['NB_COMPANIES_REPLIED_ICP'].sum(),
-            outbound_data['NB_COMPANIES_REPLIED_POSITIVE_ICP'].sum()
-        ]
-    })
+    funnel_data = outbound_funnel(outbound_data)
     fig = px.funnel(funnel_data, x='Count', y='Stage', title="Outbound Campaign Funnel")
-    st.plotly_chart(fig)
+    plotly_chart(fig)
 
-    total_new_arr_outbound = outbound_data['NEW_ARR_FROM_OB_ALL_TIME'].sum()
-    outbound_contribution_percentage = (total_new_arr_outbound / Potential_ARR) * 100
+    contribution = outbound_contribution(outbound_data, Potential_ARR)
+    total_new_arr_outbound = contribution['NEW_ARR']
+    outbound_contribution_percentage = contribution['TAM_SHARE']
     st.write(f"Total New ARR from Outbound Campaigns: ${total_new_arr_outbound:,.0f}")
     st.write(f"Total Addressable Market (TAM): ${Potential_ARR:,.0f}")
     st.write(f"Outbound Campaigns contribute {outbound_contribution_percentage:.2f}% to the Total Addressable Market (TAM)")
 
-    # Calculate conversion rates for ICP
-    outbound_data['ICP_click_through_rate'] = outbound_data['NB_COMPANIES_CLICKED_ICP'] / outbound_data['NB_COMPANIES_TOUCHED_ICP']
-    outbound_data['ICP_reply_rate'] = outbound_data['NB_COMPANIES_REPLIED_ICP'] / outbound_data['NB_COMPANIES_TOUCHED_ICP']
-    outbound_data['ICP_positive_reply_rate'] = outbound_data['NB_COMPANIES_REPLIED_POSITIVE_ICP'] / outbound_data['NB_COMPANIES_TOUCHED_ICP']
-    avg_icp_click_through_rate = outbound_data['ICP_click_through_rate'].mean()
-    avg_icp_reply_rate = outbound_data['ICP_reply_rate'].mean()
-    avg_icp_positive_reply_rate = outbound_data['ICP_positive_reply_rate'].mean()
-
-    limitations = []
-
-    if avg_icp_click_through_rate < 0.2:
-        limitations.append(f"    \n- Low click-through rate for ICP contacts. ({avg_icp_click_through_rate:.2f}%)")
-
-    if avg_icp_reply_rate < 0.1: 
-        limitations.append(f"    \n- Low reply rate from ICP contacts. ({avg_icp_reply_rate:.2f}%)")
-
-    if avg_icp_positive_reply_rate < 0.05:
-        limitations.append(f"    \n- Low positive reply rate from ICP contacts. ({avg_icp_positive_reply_rate:.2f}%)")
-
-    # Check if the number of ICP companies contacted is low (potential data limitation)
-    total_icp_companies_contacted = outbound_data['NB_COMPANIES_TOUCHED_ICP'].sum()
-    total_companies_contacted = outbound_data['NB_COMPANIES_TOUCHED'].sum()
-    total_icp_companies_contacted_percentage = total_icp_companies_contacted/total_companies_contacted
-
-    if total_icp_companies_contacted < 1000: 
-        limitations.append("Limited ICP data – not enough ICP companies are being contacted.")
+    # ICP conversion rates and coverage, and the checks outbound fails on them
+    rates = icp_rates(outbound_data)
+    total_icp_companies_contacted_percentage = icp_coverage(outbound_data)['ICP_SHARE']
+    limitation_messages = {
+        'ICP_CLICK_THROUGH_RATE': "    \n- Low click-through rate for ICP contacts. ({:.2f}%)",
+        'ICP_REPLY_RATE': "    \n- Low reply rate from ICP contacts. ({:.2f}%)",
+        'ICP_POSITIVE_REPLY_RATE': "    \n- Low positive reply rate from ICP contacts. ({:.2f}%)",
+        'ICP_COMPANIES_TOUCHED': "Limited ICP data – not enough ICP companies are being contacted.",
+    }
+    limitations = [limitation_messages[check].format(rates.get(check))
+                   for check in outbound_limitations(outbound_data)]
 
     # Final Recommendation based on limitations
     if limitations:
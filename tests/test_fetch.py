@@ -0,0 +1,82 @@
+import hashlib
+import http.server
+import os
+import threading
+
+import pytest
+
+from pages.core.fetch import FetchError, fetch_file
+
+PAYLOAD = os.urandom(900_000)
+CUT_AT = 300_000
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range support; drops the first connection after CUT_AT bytes when asked to."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get('Range')
+        server.ranges.append(range_header)
+        start = int(range_header.split('=')[1].rstrip('-')) if range_header else 0
+        body = PAYLOAD[start:]
+        self.send_response(206 if range_header else 200)
+        if range_header:
+            self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.cut and len(server.ranges) == 1:
+            self.wfile.write(body[:CUT_AT])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.ranges = []
+    httpd.cut = False
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def _url(server):
+    return f'http://127.0.0.1:{server.server_port}/database.db'
+
+
+def test_interrupted_download_resumes(server, tmp_path):
+    server.cut = True
+    dest = tmp_path / 'database.db'
+
+    fetch_file(_url(server), str(dest), sha256=hashlib.sha256(PAYLOAD).hexdigest(), backoff=0)
+
+    assert dest.read_bytes() == PAYLOAD
+    assert server.ranges[0] is None
+    # The retry asks only for what the dropped connection did not deliver
+    assert len(server.ranges) == 2
+    resumed_from = int(server.ranges[1].split('=')[1].rstrip('-'))
+    assert 0 < resumed_from <= CUT_AT
+    assert not os.path.exists(f'{dest}.part')
+
+
+def test_bad_digest_is_rejected(server, tmp_path):
+    dest = tmp_path / 'database.db'
+
+    with pytest.raises(FetchError):
+        fetch_file(_url(server), str(dest), sha256='0' * 64, retries=1, backoff=0)
+
+    assert not dest.exists()
+    assert not os.path.exists(f'{dest}.part')
+    # A rejected file is fetched again from the start, not resumed
+    assert server.ranges == [None, None]